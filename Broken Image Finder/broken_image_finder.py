@@ -5,14 +5,30 @@ Identifies and reports broken image links on a webpage
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse, urljoin
 import requests
 import argparse
 import csv
 import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.cli import positive_int
+from web_common.export import prepend_csv_header
+from web_common.fetch import fetch, configure_session, POOL_MAXSIZE
+from web_common.parsing import make_soup
+from web_common.robots import is_allowed
+
+PARSE_ONLY = SoupStrainer(['img', 'picture'])
+SRCSET_URL = re.compile(r'[\s,]*(\S+)')
+MISSING_STATUSES = {404, 410}
+
+checked_images = {}
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -25,37 +41,74 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
+# Returns the URLs listed in a srcset attribute, without their width or density descriptors
+# Follows the HTML parsing rules: a URL runs up to the next whitespace, and a comma ends a candidate
+def parse_srcset(srcset):
+    urls = []
+    position = 0
+    while True:
+        match = SRCSET_URL.match(srcset, position)
+        if not match:
+            return urls
+        url = match.group(1)
+        position = match.end()
+        if url.endswith(','):
+            url = url.rstrip(',')
+        else:
+            comma = srcset.find(',', position)
+            position = len(srcset) if comma == -1 else comma + 1
+        if url:
+            urls.append(url)
+
+# Returns the unique image URLs of a parsed webpage, in page order: each <img> src and srcset candidate,
+# and the srcset candidates of each <picture> <source> (the <source> elements of <video> and <audio> are skipped)
+def get_image_urls(soup, url):
+    sources = []
+    for element in soup.find_all(['img', 'source']):
+        if element.name == 'source' and (element.parent is None or element.parent.name != 'picture'):
+            continue
+        if element.name == 'img' and element.get('src'):
+            sources.append(element['src'])
+        sources.extend(parse_srcset(element.get('srcset', '')))
+
+    img_urls = []
+    for img_url in sources:
+        img_url = urljoin(url, img_url.strip())
+        if img_url.startswith(('http://', 'https://')):
+            img_urls.append(img_url)
+    return list(dict.fromkeys(img_urls))
+
+# Checks whether an image URL is broken, following redirects
+# Servers that reject HEAD requests (with 405, 403, 501 and so on) are asked again with a GET for the first byte only;
+# 404 and 410 mean the image is missing either way
+def is_broken_image(img_url):
     try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except Exception:
-        return False
+        response = fetch(img_url, method='HEAD', allow_redirects=True)
+        if response.status_code < 400 or response.status_code in MISSING_STATUSES:
+            return response.status_code >= 400
+        with fetch(img_url, headers={'Range': 'bytes=0-0'}, stream=True) as response:
+            return response.status_code >= 400
+    except requests.exceptions.RequestException:
+        return True
+
+# Checks every image in a parsed webpage, up to workers at the same time, and returns the URLs of the broken ones
+# Each image URL is only checked once per run, however many pages use it
+def check_images(soup, url, workers=8):
+    img_urls = get_image_urls(soup, url)
+    unchecked = [img_url for img_url in img_urls if img_url not in checked_images]
+    if unchecked:
+        if workers > POOL_MAXSIZE:
+            configure_session(pool_maxsize=workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            checked_images.update(zip(unchecked, executor.map(is_broken_image, unchecked)))
+    return [img_url for img_url in img_urls if checked_images[img_url]]
 
 # Finds images with broken links
-def find_broken_images(url):
-    broken_images = []
+def find_broken_images(url, workers=8):
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        for img in soup.find_all('img'):
-            img_url = img.get('src')
-            if img_url:
-                if not img_url.startswith(('http://', 'https://')):
-                    img_url = urljoin(url, img_url)
-                img_response = requests.head(img_url, headers=headers, timeout=5)
-                if img_response.status_code != 200:
-                    broken_images.append(img_url)
-
-        return broken_images
+        response = fetch(url)
+        soup = make_soup(response.text, parse_only=PARSE_ONLY)
+        return check_images(soup, url, workers)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL: {e}")
         return []
@@ -96,6 +149,7 @@ if __name__ == "__main__":
     parser.add_argument("urls", nargs='*', help="URL(s) to check (separated by commas)")
     parser.add_argument("--csv", action='store_true', help="Export results as CSV")
     parser.add_argument("--json", action='store_true', help="Export results as JSON")
+    parser.add_argument("--workers", type=positive_int, default=8, help="Number of images checked at the same time")
     args = parser.parse_args()
 
     urls_input = ','.join(args.urls) if args.urls else input("\nEnter URL(s) to check (separated by commas): ")
@@ -117,20 +171,21 @@ if __name__ == "__main__":
         pass
     if export_csv:
         with open("broken_image_finder.csv", "w", newline='', encoding="utf-8") as file:
-            csv_writer = csv.writer(file)
-            csv_writer.writerow(['Timestamp', 'Website', 'Total Broken Images'] + ['Broken Image ' + str(i+1) for i in range(max(len(find_broken_images(format_url(url))) for url in urls))])
+            pass
     if export_json:
         with open("broken_image_finder.json", "w", encoding="utf-8") as file:
             file.write('[')
             file.write("\n")
     
+    max_broken_images = 0
     for i, url in enumerate(urls):
         formatted_url = format_url(url)
         if not is_allowed(formatted_url):
             print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid.")
             continue
 
-        broken_images = find_broken_images(formatted_url)
+        broken_images = find_broken_images(formatted_url, args.workers)
+        max_broken_images = max(max_broken_images, len(broken_images))
         is_last_url = i == len(urls) - 1
         output_results(formatted_url, broken_images, "broken_image_finder.txt", is_last=is_last_url)
         if export_csv:
@@ -138,6 +193,8 @@ if __name__ == "__main__":
         if export_json:
             output_results(formatted_url, broken_images, "broken_image_finder.json", format='json', is_last=is_last_url)
     
+    if export_csv:
+        prepend_csv_header("broken_image_finder.csv", ['Timestamp', 'Website', 'Total Broken Images'] + ['Broken Image ' + str(i+1) for i in range(max_broken_images)])
     if export_json:
         with open("broken_image_finder.json", "a", encoding="utf-8") as file:
             file.write(']')
@@ -5,15 +5,25 @@ This script identifies and reports broken links on a webpage
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse, urljoin
 import requests
 import argparse
+import asyncio
 import csv
 import json
 import re
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.cli import positive_float, positive_int
+from web_common.export import prepend_csv_header
+from web_common.fetch import fetch
+from web_common.parsing import make_soup
+from web_common.robots import is_allowed
+from web_common.scheduler import configure_scheduler, DEFAULT_RATE
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -26,34 +36,48 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
+# Check a single link and report whether it is broken (status code of 400 or above, or no response at all)
+def is_broken_link(full_url):
     try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
+        with fetch(full_url, allow_redirects=True, stream=True) as link_response:
+            return link_response.status_code >= 400
     except Exception:
-        return False
+        return True
+
+# Check the given links concurrently and return the set of broken ones
+# At most max_concurrency requests are in flight overall, and at most max_per_host against any single host
+async def check_links(full_urls, max_concurrency=20, max_per_host=4):
+    broken_links = set()
+    global_limit = asyncio.Semaphore(max_concurrency)
+    host_limits = {}
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        async def check(full_url):
+            host = urlparse(full_url).netloc
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(max_per_host))
+            async with host_limit, global_limit:
+                if await loop.run_in_executor(executor, is_broken_link, full_url):
+                    broken_links.add(full_url)
+
+        await asyncio.gather(*(check(full_url) for full_url in full_urls))
+
+    return broken_links
 
 # Check for broken links on a webpage
-def get_broken_links(url):
+def get_broken_links(url, max_concurrency=20, max_per_host=4):
     links = set()
     broken_links = set()
+    external_links = []
     base_url = '{uri.scheme}://{uri.netloc}'.format(uri=urlparse(url))
 
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-
     try:
-        response = requests.get(url, headers=headers, timeout=5)
+        response = fetch(url)
         if response.status_code >= 400:
             broken_links.add(url)
             return links, broken_links
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = make_soup(response.text)
 
         for link in soup.find_all('a', href=True):
             href = link['href']
@@ -63,12 +87,7 @@ def get_broken_links(url):
                 links.add(full_url)
 
                 if href.startswith(('http', 'https')):
-                    try:
-                        link_response = requests.get(full_url, headers=headers, timeout=5, allow_redirects=True)
-                        if link_response.status_code >= 400:
-                            broken_links.add(full_url)
-                    except Exception:
-                        broken_links.add(full_url)
+                    external_links.append(full_url)
 
                 elif href.startswith('mailto:'):
                     if not re.match(r'^mailto:[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', href) and href != 'mailto:#':
@@ -82,6 +101,8 @@ def get_broken_links(url):
                     if not soup.find(id=href[1:]) and href != '#':
                         broken_links.add(href)
 
+        broken_links |= asyncio.run(check_links(external_links, max_concurrency, max_per_host))
+
     except requests.exceptions.RequestException as e:
         print(f"\nError fetching URL: {e}")
 
@@ -121,7 +142,11 @@ if __name__ == "__main__":
     parser.add_argument("urls", nargs='*', help="URL(s) to check (separated by commas)")
     parser.add_argument("--csv", action='store_true', help="Export results as CSV")
     parser.add_argument("--json", action='store_true', help="Export results as JSON")
+    parser.add_argument("--concurrency", type=positive_int, default=20, help="Maximum number of links checked at the same time")
+    parser.add_argument("--per-host", type=positive_int, default=4, help="Maximum number of links checked at the same time on a single host")
+    parser.add_argument("--rate", type=positive_float, default=DEFAULT_RATE, help="Maximum number of requests per second to a single host")
     args = parser.parse_args()
+    configure_scheduler(rate=args.rate)
 
     urls_input = ','.join(args.urls) if args.urls else input("\nEnter URL(s) to check (separated by commas): ")
     urls = [url.strip() for url in urls_input.split(',') if url.strip()]
@@ -142,20 +167,21 @@ if __name__ == "__main__":
         pass
     if export_csv:
         with open("broken_links_finder.csv", "w", newline='', encoding="utf-8") as file:
-            csv_writer = csv.writer(file)
-            csv_writer.writerow(['Timestamp', 'Website', 'Total Links', 'Total Broken Links'] + ['Broken Link ' + str(i+1) for i in range(max(len(get_broken_links(format_url(url))[1]) for url in urls))])
+            pass
     if export_json:
         with open("broken_links_finder.json", "w", encoding="utf-8") as file:
             file.write('[')
             file.write("\n")
     
+    max_broken_links = 0
     for i, url in enumerate(urls):
         formatted_url = format_url(url)
         if not is_allowed(formatted_url):
             print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid.")
             continue
 
-        links, broken_links = get_broken_links(formatted_url)
+        links, broken_links = get_broken_links(formatted_url, args.concurrency, args.per_host)
+        max_broken_links = max(max_broken_links, len(broken_links))
         is_last_url = i == len(urls) - 1
         output_results(formatted_url, links, broken_links, "broken_links_finder.txt", is_last=is_last_url)
         if export_csv:
@@ -163,6 +189,8 @@ if __name__ == "__main__":
         if export_json:
             output_results(formatted_url, links, broken_links, "broken_links_finder.json", format='json', is_last=is_last_url)
     
+    if export_csv:
+        prepend_csv_header("broken_links_finder.csv", ['Timestamp', 'Website', 'Total Links', 'Total Broken Links'] + ['Broken Link ' + str(i+1) for i in range(max_broken_links)])
     if export_json:
         with open("broken_links_finder.json", "a", encoding="utf-8") as file:
             file.write(']')
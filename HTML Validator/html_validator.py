@@ -5,14 +5,22 @@ This script validates the HTML content of a webpage for common errors
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse
 import requests
 import argparse
 import csv
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.fetch import fetch
+from web_common.parsing import make_soup
+from web_common.robots import is_allowed
+
+PARSE_ONLY = SoupStrainer(['title', 'meta'])
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -25,33 +33,21 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
-    try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except Exception:
-        return False
+# Check a parsed webpage for common HTML validation errors (simplified example)
+def find_html_errors(soup):
+    errors = []
+    if not soup.find('title'):
+        errors.append("Missing <title> tag.")
+    if not soup.find('meta', {'name': 'description'}):
+        errors.append("Missing meta description tag.")
+    return errors
 
 # Validate the HTML content of the webpage
 def validate_html(url):
     try:
-        response = requests.get(url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        errors = []
-
-        # Check for common HTML validation errors (simplified example)
-        if not soup.find('title'):
-            errors.append("Missing <title> tag.")
-        if not soup.find('meta', {'name': 'description'}):
-            errors.append("Missing meta description tag.")
-
-        return errors
+        response = fetch(url)
+        soup = make_soup(response.content, parse_only=PARSE_ONLY)
+        return find_html_errors(soup)
     except requests.exceptions.RequestException as e:
         print(f"\nError fetching URL: {e}")
         return None
@@ -5,13 +5,52 @@ This script downloads all images from a given webpage
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse, urljoin
 import requests
 import argparse
+import csv
+import hashlib
+import json
+import mimetypes
 import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.cli import positive_float, positive_int
+from web_common.fetch import fetch, configure_session, POOL_MAXSIZE
+from web_common.parsing import make_soup
+from web_common.robots import is_allowed
+from web_common.scheduler import configure_scheduler, DEFAULT_RATE
+
+PARSE_ONLY = SoupStrainer('img', src=True)
+CHUNK_SIZE = 65536
+INDEX_FILE = 'image_index.db'
+PROBE_BYTES = 4096
+PROBE_CHUNK_SIZE = 1024
+MAX_PROBE_BYTES = 65536
+FORMAT_NAMES = {'.png': 'PNG', '.jpg': 'JPEG', '.gif': 'GIF', '.webp': 'WebP', '.svg': 'SVG', '.avif': 'AVIF', '.bmp': 'BMP', '.ico': 'ICO', '.tif': 'TIFF'}
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+SVG_LENGTH = re.compile(r'\s*(\d+(?:\.\d+)?)\s*(?:px)?\s*')
+SVG_NUMBER = re.compile(r'[-+]?(?:\d+(?:\.\d+)?|\.\d+)')
+CONTENT_TYPE_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/svg+xml': '.svg',
+    'image/avif': '.avif',
+    'image/bmp': '.bmp',
+    'image/x-icon': '.ico',
+    'image/vnd.microsoft.icon': '.ico',
+    'image/tiff': '.tif'
+}
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -24,19 +63,6 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
-    try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except Exception:
-        return False
-        
 # Creates a directory for the downloaded images
 def create_image_directory(base_url):
     directory_name = urlparse(base_url).netloc
@@ -44,38 +70,367 @@ def create_image_directory(base_url):
         os.makedirs(directory_name)
     return directory_name
 
-# Downloads all images from the given webpage
-def download_images(url, directory_name):
+# Recognises the image format from the first bytes of the file
+def sniff_extension(data):
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return '.png'
+    if data.startswith(b'\xff\xd8\xff'):
+        return '.jpg'
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return '.gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return '.webp'
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return '.avif'
+    if data.startswith(b'BM'):
+        return '.bmp'
+    if data.startswith(b'\x00\x00\x01\x00'):
+        return '.ico'
+    if data.startswith((b'II*\x00', b'MM\x00*')):
+        return '.tif'
+    if b'<svg' in data[:1024].lower():
+        return '.svg'
+    return None
+
+# Picks the file extension for a downloaded image: from its first bytes if the format is recognised,
+# otherwise from the Content-Type header, otherwise from the URL
+def get_extension(data, content_type, img_url):
+    extension = sniff_extension(data)
+    if extension:
+        return extension
+    content_type = content_type.split(';')[0].strip().lower()
+    extension = CONTENT_TYPE_EXTENSIONS.get(content_type) or mimetypes.guess_extension(content_type)
+    if extension:
+        return extension
+    return os.path.splitext(urlparse(img_url).path)[1].lower() or '.bin'
+
+# Index of the images downloaded into a directory: the content hash and file each source URL was saved as,
+# with the ETag and Last-Modified headers needed to check later whether it has changed, kept in SQLite
+class ImageIndex:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS images (url TEXT PRIMARY KEY, hash TEXT NOT NULL, filename TEXT NOT NULL, size INTEGER NOT NULL, etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL)")
+
+    # Returns what is stored for the URL, or None if it has not been downloaded before
+    def get(self, url):
+        row = self.conn.execute("SELECT hash, filename, size, etag, last_modified FROM images WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(['hash', 'filename', 'size', 'etag', 'last_modified'], row))
+
+    # Records the stored copy of a URL, or just the time it was checked if the server reported it unchanged
+    def put(self, url, image):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO images (url, hash, filename, size, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, image['hash'], image['filename'], image['size'], image['etag'], image['last_modified'], time.time())
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+# Downloads a single image into the content-addressed store, streaming the body to disk in chunks
+# The file is named after the SHA-256 hash of its contents, so an image used on many pages or under several URLs is
+# stored once. With the stored copy of the URL, the request is conditional and None is returned if it is unchanged
+# A stored copy whose file is gone, or that has no validators, is ignored; a 304 to a request that was not conditional
+# is retried once as a plain GET that bypasses caches, and raises an HTTPError if the server answers 304 again
+def download_image(img_url, directory_name, stored=None):
+    if stored and not ((stored['etag'] or stored['last_modified']) and os.path.exists(os.path.join(directory_name, stored['filename']))):
+        stored = None
+    headers = {}
+    if stored and stored['etag']:
+        headers['If-None-Match'] = stored['etag']
+    if stored and stored['last_modified']:
+        headers['If-Modified-Since'] = stored['last_modified']
+
+    file_descriptor, part_filename = tempfile.mkstemp(suffix='.part', dir=directory_name)
+    digest = hashlib.sha256()
+    size = 0
+    extension = None
+    try:
+        with os.fdopen(file_descriptor, 'wb') as img_file:
+            response = fetch(img_url, stream=True, headers=headers)
+            if response.status_code == 304 and stored is None:
+                response.close()
+                response = fetch(img_url, stream=True, headers={'Cache-Control': 'no-cache'})
+                if response.status_code == 304:
+                    response.close()
+                    raise requests.exceptions.HTTPError(f"304 Not Modified for {img_url} without a stored copy", response=response)
+            with response:
+                unchanged = response.status_code == 304
+                if not unchanged:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if extension is None:
+                            extension = get_extension(chunk, response.headers.get('Content-Type', ''), img_url)
+                        img_file.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+    except (requests.exceptions.RequestException, OSError):
+        os.remove(part_filename)
+        raise
+    if unchanged:
+        os.remove(part_filename)
+        return None
+
+    content_hash = digest.hexdigest()
+    filename = content_hash + (extension or get_extension(b'', '', img_url))
+    if os.path.exists(os.path.join(directory_name, filename)):
+        os.remove(part_filename)
+    else:
+        os.replace(part_filename, os.path.join(directory_name, filename))
+    return {'hash': content_hash, 'filename': filename, 'size': size, 'etag': etag, 'last_modified': last_modified}
+
+# Returns the unique image URLs of the given webpage, in the order they appear
+def get_image_urls(url):
+    response = fetch(url)
+    soup = make_soup(response.text, parse_only=PARSE_ONLY)
+    img_urls = []
+    for img in soup.find_all('img', src=True):
+        img_url = img['src']
+        if not img_url.startswith(('http://', 'https://')):
+            img_url = urljoin(url, img_url)
+        img_urls.append(img_url)
+    return list(dict.fromkeys(img_urls))
+
+# Downloads all images from the given webpage, up to workers at the same time, into the content-addressed store
+# In incremental mode, images already in the store are only checked with a conditional request, or skipped outright
+# when the server gave no ETag or Last-Modified for them
+# Returns the number of images downloaded, the number found unchanged and the total number of bytes transferred
+def download_images(url, directory_name, workers=8, incremental=False):
+    image_count = 0
+    unchanged_count = 0
+    total_bytes = 0
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        img_urls = get_image_urls(url)
+    except requests.exceptions.RequestException as e:
+        print(f"\nError fetching URL: {e}")
+        return image_count, unchanged_count, total_bytes
 
-        image_count = 0
-        for img in soup.find_all('img', src=True):
-            img_url = img['src']
-            if not img_url.startswith(('http://', 'https://')):
-                img_url = urljoin(url, img_url)
+    index = ImageIndex(os.path.join(directory_name, INDEX_FILE))
+    if workers > POOL_MAXSIZE:
+        configure_session(pool_maxsize=workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for img_url in img_urls:
+            stored = index.get(img_url) if incremental else None
+            if stored and not os.path.exists(os.path.join(directory_name, stored['filename'])):
+                stored = None
+            if stored and not stored['etag'] and not stored['last_modified']:
+                unchanged_count += 1
+                print(f"Unchanged: {img_url}")
+                continue
+            futures[executor.submit(download_image, img_url, directory_name, stored)] = img_url
 
+        for future in as_completed(futures):
+            img_url = futures[future]
             try:
-                img_data = requests.get(img_url, headers=headers, timeout=5).content
-                img_filename = os.path.join(directory_name, f'image_{image_count}.png')
-                with open(img_filename, 'wb') as img_file:
-                    img_file.write(img_data)
-                image_count += 1
-                print(f"Downloaded: {img_url}")
-            except requests.exceptions.RequestException as e:
+                image = future.result()
+            except (requests.exceptions.RequestException, OSError) as e:
                 print(f"Failed to download: {img_url} - {e}")
+                continue
+            if image is None:
+                unchanged_count += 1
+                print(f"Unchanged: {img_url}")
+                continue
+            index.put(img_url, image)
+            image_count += 1
+            total_bytes += image['size']
+            print(f"Downloaded: {img_url} -> {image['filename']}")
+    index.close()
+    return image_count, unchanged_count, total_bytes
+
+# Finds the pixel dimensions of a JPEG in its first start-of-frame segment, or returns None if it is not in data yet
+def get_jpeg_size(data):
+    position = 2
+    while position + 9 < len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            position += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height = int.from_bytes(data[position + 5:position + 7], 'big')
+            width = int.from_bytes(data[position + 7:position + 9], 'big')
+            return width, height
+        position += 2 + int.from_bytes(data[position + 2:position + 4], 'big')
+    return None
+
+# Finds the pixel dimensions of a WebP image from its VP8, VP8L or VP8X header
+def get_webp_size(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30:
+        return int.from_bytes(data[26:28], 'little') & 0x3FFF, int.from_bytes(data[28:30], 'little') & 0x3FFF
+    if chunk == b'VP8L' and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(data) >= 30:
+        return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    return None
+
+# Finds the dimensions of an SVG image from the width and height of its root element, or else its viewBox
+# Values that are not plain numbers (percentages, ems, 'auto' and the like) give no size rather than an error
+def get_svg_size(data):
+    match = re.search(rb'<svg\b[^>]*>', data, re.IGNORECASE)
+    if not match:
+        return None
+    tag = match.group(0).decode('utf-8', 'replace')
+    attributes = dict((key.lower(), value) for key, _, value in re.findall(r'([\w:-]+)\s*=\s*(["\'])(.*?)\2', tag))
+    width = SVG_LENGTH.fullmatch(attributes.get('width', ''))
+    height = SVG_LENGTH.fullmatch(attributes.get('height', ''))
+    view_box = attributes.get('viewbox', '').replace(',', ' ').split()
+    if width and height:
+        size = width.group(1), height.group(1)
+    elif len(view_box) == 4 and all(SVG_NUMBER.fullmatch(value) for value in view_box):
+        size = view_box[2], view_box[3]
+    else:
+        return None
+    try:
+        return round(float(size[0])), round(float(size[1]))
+    except OverflowError:
+        return None
+
+# Recognises the format of an image from its first bytes and reads its pixel dimensions from the header
+# Returns the format name (or None) and the size as (width, height), or None when it is not in data
+def get_image_info(data):
+    extension = sniff_extension(data)
+    size = None
+    if extension == '.png' and len(data) >= 24:
+        size = int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big')
+    elif extension == '.gif' and len(data) >= 10:
+        size = int.from_bytes(data[6:8], 'little'), int.from_bytes(data[8:10], 'little')
+    elif extension == '.jpg':
+        size = get_jpeg_size(data)
+    elif extension == '.webp':
+        size = get_webp_size(data)
+    elif extension == '.svg':
+        size = get_svg_size(data)
+    return FORMAT_NAMES.get(extension), size
+
+# Reads the full size of an image from Content-Range for a partial response, or Content-Length otherwise
+def get_total_size(response):
+    if response.status_code == 206:
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get('Content-Length', '')
+    return int(length) if length.isdigit() else None
+
+# Probes an image without downloading it: asks for its first PROBE_BYTES with a Range request, and for the rest of
+# its first MAX_PROBE_BYTES only if the dimensions were not in them (for example a JPEG with a large EXIF block)
+# Reading stops as soon as the dimensions are known, so servers that ignore Range are cut off early too,
+# and a partial response that adds no bytes ends the probe rather than being asked for again
+# Returns the image's format, width, height and size in bytes, and the number of bytes actually transferred
+def probe_image(img_url):
+    data = b''
+    transferred = 0
+    while True:
+        end = PROBE_BYTES - 1 if not data else MAX_PROBE_BYTES - 1
+        with fetch(img_url, stream=True, headers={'Range': f'bytes={len(data)}-{end}'}) as response:
+            response.raise_for_status()
+            partial = response.status_code == 206
+            if not partial:
+                data = b''
+            received = 0
+            for chunk in response.iter_content(chunk_size=PROBE_CHUNK_SIZE):
+                data += chunk
+                received += len(chunk)
+                if get_image_info(data)[1] is not None or len(data) >= MAX_PROBE_BYTES:
+                    break
+            transferred += received
+            total_size = get_total_size(response)
+            content_type = response.headers.get('Content-Type', '')
+        format_name, size = get_image_info(data)
+        if size is not None or not partial or not received or len(data) >= MAX_PROBE_BYTES or len(data) >= (total_size or 0):
+            break
+
+    if format_name is None:
+        format_name = FORMAT_NAMES.get(get_extension(data, content_type, img_url))
+    width, height = size or (None, None)
+    return {'url': img_url, 'format': format_name, 'width': width, 'height': height, 'bytes': total_size, 'transferred': transferred}
+
+# Probes all images on the given webpage, up to workers at the same time, and returns them in page order
+def probe_images(url, workers=8):
+    try:
+        img_urls = get_image_urls(url)
     except requests.exceptions.RequestException as e:
         print(f"\nError fetching URL: {e}")
-    return image_count
+        return None
+
+    if workers > POOL_MAXSIZE:
+        configure_session(pool_maxsize=workers)
+    images = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(probe_image, img_url): img_url for img_url in img_urls}
+        for future in as_completed(futures):
+            img_url = futures[future]
+            try:
+                images.append(future.result())
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Failed to probe: {img_url} - {e}")
+    order = {img_url: number for number, img_url in enumerate(img_urls)}
+    return sorted(images, key=lambda image: order[image['url']])
+
+# Output the image weight report to a file and print it to the console along with datetime program was run
+def output_results(url, images, output_file, format='txt'):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    total_bytes = sum(image['bytes'] or 0 for image in images)
+    transferred = sum(image['transferred'] for image in images)
+    if format == 'csv':
+        with open(output_file, "w", newline='', encoding="utf-8") as file:
+            csv_writer = csv.writer(file)
+            csv_writer.writerow(['Timestamp', 'URL', 'Image URL', 'Format', 'Width', 'Height', 'Bytes'])
+            for image in images:
+                csv_writer.writerow([timestamp, url, image['url'], image['format'], image['width'], image['height'], image['bytes']])
+        print(f"Results saved to {output_file}")
+    elif format == 'json':
+        result_data = {
+            'timestamp': timestamp,
+            'url': url,
+            'total_bytes': total_bytes,
+            'images': [{key: image[key] for key in ['url', 'format', 'width', 'height', 'bytes']} for image in images]
+        }
+        with open(output_file, "w", encoding="utf-8") as file:
+            json.dump(result_data, file, indent=4)
+        print(f"Results saved to {output_file}")
+    else:
+        with open(output_file, "w", encoding="utf-8") as file:
+            file.write(f"Timestamp: {timestamp}\nURL: {url}\n")
+            print(f"\nTimestamp: {timestamp}\nURL: {url}")
+            for image in images:
+                dimensions = f"{image['width']}x{image['height']}" if image['width'] is not None else 'unknown size'
+                weight = f"{image['bytes'] / 1024:.1f} KB" if image['bytes'] is not None else 'unknown bytes'
+                line = f"{image['url']} - {image['format'] or 'unknown format'}, {dimensions}, {weight}\n"
+                file.write(line)
+                print(line.strip())
+            line = f"Total image weight: {total_bytes / 1024:.1f} KB in {len(images)} images ({transferred / 1024:.1f} KB transferred to probe them)\n"
+            file.write(line)
+            print(line.strip())
+        print(f"\nResults saved to {output_file}")
 
 # Main Function used to gather input and call other functions
 # It will check for accessibility and empty text before continuing to output
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Image Extractor Script")
     parser.add_argument("url", help="URL to check", nargs='?', default='')
+    parser.add_argument("--workers", type=positive_int, default=8, help="Number of images downloaded at the same time")
+    parser.add_argument("--probe", action='store_true', help="Report the format, dimensions and size of each image instead of downloading them")
+    parser.add_argument("--csv", action='store_true', help="Export the probe report as CSV")
+    parser.add_argument("--json", action='store_true', help="Export the probe report as JSON")
+    parser.add_argument("--incremental", action='store_true', help="Skip images already downloaded that have not changed")
+    parser.add_argument("--rate", type=positive_float, default=DEFAULT_RATE, help="Maximum number of requests per second to each host")
     args = parser.parse_args()
+    configure_scheduler(rate=args.rate)
 
     if not args.url.strip():
         args.url = input("\nEnter a URL to check: ").strip()
@@ -89,8 +444,29 @@ if __name__ == "__main__":
         print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid. Exiting program.")
         exit()
     
+    if args.probe:
+        images = probe_images(formatted_url, args.workers)
+        if images is not None:
+            output_results(formatted_url, images, "image_extractor.txt")
+
+            export_csv = args.csv
+            export_json = args.json
+            if not export_csv:
+                export_csv = input("Export results as CSV? (y/n): ").strip().lower() == 'y'
+            if export_csv:
+                output_results(formatted_url, images, "image_extractor.csv", format='csv')
+            if not export_json:
+                export_json = input("Export results as JSON? (y/n): ").strip().lower() == 'y'
+            if export_json:
+                output_results(formatted_url, images, "image_extractor.json", format='json')
+        exit()
+
     print("\nDownloading image files...")
-    formatted_url = format_url(args.url)
     directory_name = create_image_directory(formatted_url)
-    image_count = download_images(formatted_url, directory_name)
+    start_time = time.perf_counter()
+    image_count, unchanged_count, total_bytes = download_images(formatted_url, directory_name, args.workers, args.incremental)
+    elapsed = time.perf_counter() - start_time
     print(f"\nTotal images downloaded: {image_count}")
+    if args.incremental:
+        print(f"Unchanged images skipped: {unchanged_count}")
+    print(f"Total size: {total_bytes / 1024:.1f} KB in {elapsed:.2f} seconds ({total_bytes / 1024 / max(elapsed, 1e-9):.1f} KB/s)")
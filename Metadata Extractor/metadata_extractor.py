@@ -5,14 +5,26 @@ This script extracts metadata (title, description, keywords) from a given webpag
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
+from html.parser import HTMLParser
 from urllib.parse import urlparse, urljoin
 import requests
 import argparse
+import codecs
 import csv
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.fetch import fetch
+from web_common.parsing import make_soup
+from web_common.robots import is_allowed
+
+CHUNK_SIZE = 8192
+HEAD_TAGS = {'html', 'head', 'title', 'meta', 'link', 'base', 'script', 'style', 'noscript', 'template'}
+PARSE_ONLY = SoupStrainer(['title', 'meta'])
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -25,39 +37,98 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
-    try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except Exception:
-        return False
+# Builds the metadata dictionary from the page title and the attributes of each <meta> tag
+def build_metadata(title, meta_attrs):
+    metadata = {
+        'title': title,
+        'description': '',
+        'keywords': ''
+    }
+
+    for attrs in meta_attrs:
+        if 'name' in attrs and attrs['name'].lower() == 'description':
+            metadata['description'] = attrs['content']
+        elif 'name' in attrs and attrs['name'].lower() == 'keywords':
+            metadata['keywords'] = attrs['content']
+
+    return metadata
+
+# Extracts the title, description and keywords from a parsed webpage
+def parse_metadata(soup):
+    return build_metadata(soup.title.string if soup.title else '', [meta_tag.attrs for meta_tag in soup.find_all('meta')])
+
+# Incremental parser that only collects the <title> text and <meta> tags of a document
+# It sets done as soon as </head>, <body> or the first tag that belongs in the body is seen outside a <noscript>;
+# tags inside a <noscript>, such as the <img> of a tracking pixel, are ignored
+class HeadParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.title = ''
+        self.title_parts = None
+        self.meta_attrs = []
+        self.noscript_depth = 0
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'noscript':
+            self.noscript_depth += 1
+        elif self.noscript_depth:
+            return
+        elif tag == 'title' and self.title_parts is None:
+            self.title_parts = []
+        elif tag == 'meta':
+            self.meta_attrs.append({key: value if value is not None else '' for key, value in attrs})
+        elif tag not in HEAD_TAGS:
+            self.done = True
+
+    def handle_startendtag(self, tag, attrs):
+        if tag != 'noscript':
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'noscript':
+            self.noscript_depth = max(self.noscript_depth - 1, 0)
+        elif tag == 'title' and self.title_parts is not None and self.title == '':
+            self.title = ''.join(self.title_parts) or None
+        elif tag == 'head':
+            self.done = True
+
+    def handle_data(self, data):
+        if self.title_parts is not None and self.title == '':
+            self.title_parts.append(data)
+
+    # Flush the text and tags still buffered at the end of the document, keeping a title that was never closed
+    def close(self):
+        super().close()
+        if self.title_parts is not None and self.title == '':
+            self.title = ''.join(self.title_parts) or None
+
+# Extracts metadata from the webpage, reading the body in chunks and closing the connection once the head has been read
+# When the document ends before the head does, the decoder and parser are flushed so nothing buffered is lost
+def extract_head_metadata(url):
+    with fetch(url, stream=True) as response:
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        head_parser = HeadParser()
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            head_parser.feed(decoder.decode(chunk))
+            if head_parser.done:
+                break
+        else:
+            head_parser.feed(decoder.decode(b'', final=True))
+            head_parser.close()
+    return build_metadata(head_parser.title, head_parser.meta_attrs)
 
 # Extracts metadata from the webpage
-def extract_metadata(url):
+# With head_only, only the document head is downloaded and parsed (see extract_head_metadata)
+def extract_metadata(url, head_only=False):
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        metadata = {
-            'title': soup.title.string if soup.title else '',
-            'description': '',
-            'keywords': ''
-        }
-
-        for meta_tag in soup.find_all('meta'):
-            if 'name' in meta_tag.attrs and meta_tag.attrs['name'].lower() == 'description':
-                metadata['description'] = meta_tag.attrs['content']
-            elif 'name' in meta_tag.attrs and meta_tag.attrs['name'].lower() == 'keywords':
-                metadata['keywords'] = meta_tag.attrs['content']
-
-        return metadata
+        if head_only:
+            return extract_head_metadata(url)
+        response = fetch(url)
+        soup = make_soup(response.text, parse_only=PARSE_ONLY)
+        return parse_metadata(soup)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL: {e}")
         return {}
@@ -98,6 +169,7 @@ if __name__ == "__main__":
     parser.add_argument("urls", nargs='*', help="URL(s) to check (separated by commas)")
     parser.add_argument("--csv", action='store_true', help="Export results as CSV")
     parser.add_argument("--json", action='store_true', help="Export results as JSON")
+    parser.add_argument("--head-only", action='store_true', help="Only download and parse the head of each page")
     args = parser.parse_args()
 
     urls_input = ','.join(args.urls) if args.urls else input("\nEnter URL(s) to check (separated by commas): ")
@@ -129,7 +201,7 @@ if __name__ == "__main__":
     for i, url in enumerate(urls):
         formatted_url = format_url(url)
         if is_allowed(formatted_url):
-            metadata = extract_metadata(formatted_url)
+            metadata = extract_metadata(formatted_url, args.head_only)
             is_last_url = i == len(urls) - 1
             output_results(formatted_url, metadata, "metadata_extractor.txt", is_last=is_last_url)
             if export_csv:
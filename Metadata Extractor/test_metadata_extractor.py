@@ -0,0 +1,55 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Tests for the head-only parser of the Metadata Extractor
+Run with: python -m unittest discover -s "Metadata Extractor" (or pytest)
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from metadata_extractor import HeadParser, build_metadata, parse_metadata, make_soup, PARSE_ONLY
+
+TRACKING_PIXEL_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<title>T</title>
+<script>fbq('init', '1');</script>
+<noscript><img height="1" width="1" style="display:none" src="https://www.facebook.com/tr?id=1&ev=PageView"/></noscript>
+<meta name="description" content="D">
+<meta name="keywords" content="K">
+</head>
+<body><img src="a.png"><meta name="description" content="in body"></body>
+</html>"""
+
+# Feed a document to a HeadParser in chunks of the given size and return the metadata it collected
+def parse_head(html, chunk_size=8192):
+    parser = HeadParser()
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start:start + chunk_size])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return build_metadata(parser.title, parser.meta_attrs)
+
+class HeadParserTest(unittest.TestCase):
+    def test_tracking_pixel_in_noscript_does_not_end_the_head(self):
+        expected = {'title': 'T', 'description': 'D', 'keywords': 'K'}
+        self.assertEqual(parse_head(TRACKING_PIXEL_PAGE), expected)
+        self.assertEqual(parse_head(TRACKING_PIXEL_PAGE, chunk_size=7), expected)
+
+    def test_head_only_matches_full_parse_for_head_metadata(self):
+        full = parse_metadata(make_soup(TRACKING_PIXEL_PAGE.split('<body>')[0], parse_only=PARSE_ONLY))
+        self.assertEqual(parse_head(TRACKING_PIXEL_PAGE), full)
+
+    def test_body_tag_outside_noscript_ends_the_head(self):
+        parser = HeadParser()
+        parser.feed('<html><head><noscript><img src="p"></noscript><body><meta name="description" content="late">')
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.meta_attrs, [])
+
+if __name__ == "__main__":
+    unittest.main()
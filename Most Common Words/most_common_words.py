@@ -5,18 +5,34 @@ This script analyzes a web page to identify the most frequently occurring words
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
+from array import array
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse
-import urllib.error
 import requests
 import re
-import socket
 import argparse
+import base64
 import csv
+import hashlib
+import heapq
 import json
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.cli import positive_int, unit_fraction
+from web_common.crawl import crawl_pages
+from web_common.fetch import fetch, configure_session, POOL_MAXSIZE
+from web_common.parsing import make_soup
+from web_common.robots import is_allowed
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+DEFAULT_EPSILON = 0.00005
+DEFAULT_DELTA = 0.001
+CANDIDATE_FACTOR = 4
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -29,44 +45,209 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
-    try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except (socket.gaierror, urllib.error.URLError, UnicodeError):
-        return False
-    
+# Count every word in a parsed webpage
+def count_words(soup):
+    return Counter(WORD_PATTERN.findall(soup.get_text().lower()))
+
+# Count the most frequently used words in a parsed webpage
+def count_top_words(soup, top_n=10):
+    return count_words(soup).most_common(top_n)
+
 # Count the occurrences of the top ten most frequently used words
 def get_top_words(url, top_n=10):
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        text = soup.get_text().lower()
-        words = re.findall(r'\b\w+\b', text)
-        word_counts = Counter(words).most_common(top_n)
-        
-        return word_counts
+        response = fetch(url)
+        soup = make_soup(response.text)
+        return count_top_words(soup, top_n)
     except requests.exceptions.RequestException as e:
         print(f"\nError fetching URL: {e}")
         return None
 
+# Approximate word counts in a fixed amount of memory: a Count-Min Sketch of every word plus a heap of the heaviest words
+# The table has e / epsilon columns and ln(1 / delta) rows whatever the size of the corpus; an estimate is never below the
+# true count and, with probability 1 - delta, at most epsilon times the total number of words above it
+# Sketches with the same epsilon and delta can be merged, for example the results of separate runs
+# epsilon and delta must be strictly between 0 and 1; any other value raises ValueError
+class CountMinSketch:
+    def __init__(self, epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA, capacity=0):
+        if not (0 < epsilon < 1 and 0 < delta < 1):
+            raise ValueError(f"epsilon and delta must be between 0 and 1 (exclusive), got {epsilon} and {delta}")
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.capacity = capacity
+        self.table = array('q', bytes(8 * self.width * self.depth))
+        self.total = 0
+        self.candidates = {}
+        self.heap = []
+
+    # Estimated count of a word, so the sketch can be read like a Counter
+    def __getitem__(self, word):
+        return min(self.table[cell] for cell in self.cells(word))
+
+    # The word's cell in each row, from the two halves of a stable hash (Python's own hash differs between processes)
+    def cells(self, word):
+        digest = hashlib.blake2b(word.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [row * self.width + (first + row * second) % self.width for row in range(self.depth)]
+
+    # Add a mapping of words to counts, or an iterable of words counted once each, as Counter.update does
+    def update(self, words):
+        items = words.items() if hasattr(words, 'items') else ((word, 1) for word in words)
+        for word, count in items:
+            cells = self.cells(word)
+            for cell in cells:
+                self.table[cell] += count
+            self.total += count
+            if self.capacity:
+                self.track(word, min(self.table[cell] for cell in cells))
+
+    # Keep the word among the heavy-hitter candidates if its estimate beats the lightest candidate
+    # Old heap entries are skipped when they reach the top, and the heap is rebuilt when too many pile up
+    def track(self, word, estimate):
+        if word not in self.candidates and len(self.candidates) >= self.capacity:
+            while self.candidates.get(self.heap[0][1]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+            if estimate <= self.heap[0][0]:
+                return
+            del self.candidates[heapq.heappop(self.heap)[1]]
+        self.candidates[word] = estimate
+        heapq.heappush(self.heap, (estimate, word))
+        if len(self.heap) > CANDIDATE_FACTOR * self.capacity:
+            self.rebuild_heap()
+
+    def rebuild_heap(self):
+        self.heap = [(estimate, word) for word, estimate in self.candidates.items()]
+        heapq.heapify(self.heap)
+
+    # Add the counts of another sketch built with the same epsilon and delta
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Only sketches built with the same epsilon and delta can be merged")
+        for cell, count in enumerate(other.table):
+            self.table[cell] += count
+        self.total += other.total
+        self.capacity = max(self.capacity, other.capacity)
+        words = set(self.candidates) | set(other.candidates)
+        self.candidates = dict(heapq.nlargest(self.capacity, ((word, self[word]) for word in words), key=lambda item: item[1]))
+        self.rebuild_heap()
+
+    # The n words with the highest estimated counts, in the same form as Counter.most_common
+    def most_common(self, n=None):
+        return sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def to_dict(self):
+        return {
+            'width': self.width,
+            'depth': self.depth,
+            'capacity': self.capacity,
+            'total': self.total,
+            'table': base64.b64encode(self.table.tobytes()).decode('ascii'),
+            'candidates': self.candidates
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls.__new__(cls)
+        sketch.width = data['width']
+        sketch.depth = data['depth']
+        sketch.capacity = data['capacity']
+        sketch.total = data['total']
+        sketch.table = array('q')
+        sketch.table.frombytes(base64.b64decode(data['table']))
+        sketch.candidates = data['candidates']
+        sketch.rebuild_heap()
+        return sketch
+
+# Save the word and document-frequency sketches of a run, with the number of pages counted, so later runs can merge them
+def save_sketches(path, pages, totals, document_frequency):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({'pages': pages, 'words': totals.to_dict(), 'documents': document_frequency.to_dict()}, file)
+
+# Load the sketches saved by save_sketches, returning the number of pages and the two sketches
+def load_sketches(path):
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    return data['pages'], CountMinSketch.from_dict(data['words']), CountMinSketch.from_dict(data['documents'])
+
+# Fetch a page for the corpus, returning its HTML, or None for errors and responses that are not HTML
+def fetch_page_html(url):
+    try:
+        response = fetch(url)
+        if response.status_code >= 400 or 'html' not in response.headers.get('Content-Type', 'text/html'):
+            return None
+        return response.text
+    except requests.exceptions.RequestException as e:
+        print(f"\nError fetching URL {url}: {e}")
+        return None
+
+# Parse a page and count its words; runs in a worker process, so only the page's own Counter is sent back
+def count_page_words(html):
+    return count_words(make_soup(html))
+
+# Count the most frequently used words across many pages, and the number of pages each of them appears on
+# corpus yields (url, html) pairs: pages already downloaded, such as those of a crawl, carry their HTML, and pages with None
+# are fetched by up to fetch_workers threads; every page is parsed and tokenized in up to processes worker processes;
+# each worker returns a partial Counter for its page, which is merged into the site-wide totals as soon as it arrives.
+# At most a few pages per worker are in flight at once, so memory grows with the vocabulary, not with the number of pages
+# totals and document_frequency default to exact Counters; pass CountMinSketch objects to count in a fixed amount of memory
+# Returns the top words with their counts, the document frequency of each of them and the number of pages counted
+def get_corpus_top_words(corpus, top_n=10, processes=None, fetch_workers=8, totals=None, document_frequency=None):
+    processes = processes or os.cpu_count() or 1
+    if fetch_workers > POOL_MAXSIZE:
+        configure_session(pool_maxsize=fetch_workers)
+    max_in_flight = fetch_workers + 2 * processes
+
+    totals = Counter() if totals is None else totals
+    document_frequency = Counter() if document_frequency is None else document_frequency
+    pages = 0
+    corpus = iter(corpus)
+    fetching = {}
+    tokenizing = {}
+    with ThreadPoolExecutor(max_workers=fetch_workers) as threads, ProcessPoolExecutor(max_workers=processes) as workers:
+        while True:
+            while len(fetching) + len(tokenizing) < max_in_flight:
+                url, html = next(corpus, (None, None))
+                if url is None:
+                    break
+                if html is not None:
+                    tokenizing[workers.submit(count_page_words, html)] = url
+                    continue
+                if not is_allowed(url):
+                    print(f"Skipping {url}, disallowed by robots.txt")
+                    continue
+                fetching[threads.submit(fetch_page_html, url)] = url
+            if not fetching and not tokenizing:
+                break
+
+            done, _ = wait(list(fetching) + list(tokenizing), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in fetching:
+                    url = fetching.pop(future)
+                    html = future.result()
+                    if html is not None:
+                        tokenizing[workers.submit(count_page_words, html)] = url
+                else:
+                    url = tokenizing.pop(future)
+                    page_counts = future.result()
+                    totals.update(page_counts)
+                    document_frequency.update(page_counts.keys())
+                    pages += 1
+
+    top_words = totals.most_common(top_n)
+    return top_words, {word: document_frequency[word] for word, _ in top_words}, pages
+
 # Output the results to a file and print them to the console along with datetime program was run
-def output_results(url, counts, output_file, format='txt'):
+# For a corpus, document_frequency gives the number of the pages counted that each word appears on
+def output_results(url, counts, output_file, format='txt', document_frequency=None, pages=None):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    corpus = document_frequency is not None
     if format == 'csv':
         with open(output_file, "w", newline='', encoding="utf-8") as file:
             csv_writer = csv.writer(file)
-            csv_writer.writerow(['Timestamp', 'URL', 'Text', 'Count'])
+            csv_writer.writerow(['Timestamp', 'URL', 'Text', 'Count'] + (['Pages', 'Total Pages'] if corpus else []))
             for text, count in counts:
-                csv_writer.writerow([timestamp, url, text, count])
+                csv_writer.writerow([timestamp, url, text, count] + ([document_frequency[text], pages] if corpus else []))
         print(f"Results saved to {output_file}")
     elif format == 'json':
         result_data = {
@@ -74,6 +255,10 @@ def output_results(url, counts, output_file, format='txt'):
             'url': url,
             'results': [{'text': text, 'count': count} for text, count in counts]
         }
+        if corpus:
+            result_data['pages'] = pages
+            for result in result_data['results']:
+                result['pages'] = document_frequency[result['text']]
         with open(output_file, "w", encoding="utf-8") as file:
             json.dump(result_data, file, indent=4)
         print(f"Results saved to {output_file}")
@@ -82,7 +267,10 @@ def output_results(url, counts, output_file, format='txt'):
             file.write(f"Timestamp: {timestamp}\nURL: {url}\n")
             print(f"\nTimestamp: {timestamp}\nURL: {url}")
             for text, count in counts:
-                line = f"The text '{text}' appears {count} times on the page\n"
+                if corpus:
+                    line = f"The text '{text}' appears {count} times on {document_frequency[text]} of {pages} pages\n"
+                else:
+                    line = f"The text '{text}' appears {count} times on the page\n"
                 file.write(line)
                 print(line.strip())
         print(f"\nResults saved to {output_file}")
@@ -95,34 +283,80 @@ if __name__ == "__main__":
     parser.add_argument("top", type=int, nargs='?', help="Number of top words to display")
     parser.add_argument("--csv", action='store_true', help="Export results as CSV")
     parser.add_argument("--json", action='store_true', help="Export results as JSON")
+    parser.add_argument("--urls", help="File with one URL per line to count words across, instead of a single page")
+    parser.add_argument("--crawl", action='store_true', help="Crawl the site from the URL and count words across every page found")
+    parser.add_argument("--max-depth", type=int, default=3, help="Maximum number of links to follow from the start page when crawling")
+    parser.add_argument("--max-pages", type=int, default=1000, help="Maximum number of pages to collect when crawling")
+    parser.add_argument("--workers", type=positive_int, default=8, help="Number of pages fetched at the same time for a corpus")
+    parser.add_argument("--processes", type=positive_int, default=None, help="Number of worker processes tokenizing pages for a corpus (default: one per CPU)")
+    parser.add_argument("--approximate", action='store_true', help="Count a corpus approximately in a fixed amount of memory with a Count-Min Sketch")
+    parser.add_argument("--epsilon", type=unit_fraction, default=DEFAULT_EPSILON, help="Maximum overcount of an approximate count, as a fraction of all words counted")
+    parser.add_argument("--delta", type=unit_fraction, default=DEFAULT_DELTA, help="Probability that an approximate count exceeds the epsilon bound")
+    parser.add_argument("--sketch-file", help="Merge the approximate counts into the sketches saved in this file, and save the result back to it (implies --approximate)")
     args = parser.parse_args()
 
-    if not args.url.strip():
-        args.url = input("\nEnter a URL to check: ").strip()
-    
-    if not args.url:
-        print("\nNo URL provided. Exiting program.")
-        exit()
-
-    formatted_url = format_url(args.url)
-    if not is_allowed(formatted_url):
-        print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid. Exiting program.")
-        exit()
-        
+    document_frequency = None
+    pages = None
+    if args.urls:
+        # With a URL list there is no page URL, so a lone number is the number of top words
+        if args.top is None and args.url.strip().isdigit():
+            args.top = int(args.url)
+        with open(args.urls, encoding="utf-8") as file:
+            corpus = [(format_url(line.strip()), None) for line in file if line.strip()]
+        if not corpus:
+            print("\nNo URLs found in the URL list. Exiting program.")
+            exit()
+        formatted_url = args.urls
+    else:
+        if not args.url.strip():
+            args.url = input("\nEnter a URL to check: ").strip()
+
+        if not args.url:
+            print("\nNo URL provided. Exiting program.")
+            exit()
+
+        formatted_url = format_url(args.url)
+        if not is_allowed(formatted_url):
+            print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid. Exiting program.")
+            exit()
+
     if args.top is None:
         args.top = int(input("Enter the number of top words to display: ").strip())
 
-    counts = get_top_words(formatted_url, args.top)
+    if args.urls or args.crawl:
+        if args.crawl and not args.urls:
+            corpus = crawl_pages(formatted_url, args.max_depth, args.max_pages, args.workers, "most_common_words.db")
+        if args.approximate or args.sketch_file:
+            totals = CountMinSketch(args.epsilon, args.delta, capacity=CANDIDATE_FACTOR * args.top)
+            document_frequency = CountMinSketch(args.epsilon, args.delta)
+            _, _, pages = get_corpus_top_words(corpus, args.top, args.processes, args.workers, totals, document_frequency)
+            if args.sketch_file and os.path.exists(args.sketch_file):
+                saved_pages, saved_totals, saved_document_frequency = load_sketches(args.sketch_file)
+                try:
+                    totals.merge(saved_totals)
+                    document_frequency.merge(saved_document_frequency)
+                except ValueError as e:
+                    print(f"\nCould not merge with {args.sketch_file}: {e}. Exiting program.")
+                    exit()
+                pages += saved_pages
+            if args.sketch_file:
+                save_sketches(args.sketch_file, pages, totals, document_frequency)
+            counts = totals.most_common(args.top)
+            document_frequency = {word: document_frequency[word] for word, _ in counts}
+        else:
+            counts, document_frequency, pages = get_corpus_top_words(corpus, args.top, args.processes, args.workers)
+    else:
+        counts = get_top_words(formatted_url, args.top)
     if counts:
-        output_results(formatted_url, counts, "most_common_words.txt")
+        output_results(formatted_url, counts, "most_common_words.txt", document_frequency=document_frequency, pages=pages)
 
         export_csv = args.csv
         export_json = args.json
         if not export_csv:
             export_csv = input("Export results as CSV? (y/n): ").strip().lower() == 'y'
         if export_csv:
-            output_results(formatted_url, counts, "most_common_words.csv", format='csv')
+            output_results(formatted_url, counts, "most_common_words.csv", format='csv', document_frequency=document_frequency, pages=pages)
         if not export_json:
             export_json = input("Export results as JSON? (y/n): ").strip().lower() == 'y'
         if export_json:
-            output_results(formatted_url, counts, "most_common_words.json", format='json')
+            output_results(formatted_url, counts, "most_common_words.json", format='json', document_frequency=document_frequency, pages=pages)
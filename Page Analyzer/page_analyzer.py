@@ -0,0 +1,186 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+This script fetches and parses each webpage once and runs the analyses of several other tools on it
+For full documentation, see the README in this tool's directory
+"""
+
+from datetime import datetime
+from urllib.parse import urlparse
+import requests
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from web_common.fetch import fetch
+from web_common.parsing import make_soup, set_default_parser, PARSERS
+from web_common.robots import is_allowed
+
+ANALYSES = ['metadata', 'theme', 'social', 'words', 'html', 'images']
+
+# Loads another tool's script from its directory so its analysis functions can be reused
+def load_tool(directory, name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT_DIR, directory, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+metadata_extractor = load_tool("Metadata Extractor", "metadata_extractor")
+theme_detector = load_tool("Theme Detector", "theme_detector")
+social_link_extractor = load_tool("Social Link Extractor", "social_link_extractor")
+most_common_words = load_tool("Most Common Words", "most_common_words")
+html_validator = load_tool("HTML Validator", "html_validator")
+broken_image_finder = load_tool("Broken Image Finder", "broken_image_finder")
+
+# Add 'https://' to the URL if it doesn't have a scheme
+# Append '.com' if the URL doesn't have a domain extension
+def format_url(url):
+    if not url:
+        return None
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    if '.' not in urlparse(url).netloc:
+        url += '.com'
+    return url
+
+# Fetches and parses the webpage once, then runs each selected analysis on the shared document
+def analyze_page(url, analyses=ANALYSES, top_n=10):
+    try:
+        response = fetch(url)
+        soup = make_soup(response.text)
+    except requests.exceptions.RequestException as e:
+        print(f"\nError fetching URL: {e}")
+        return None
+
+    results = {}
+    if 'metadata' in analyses:
+        results['metadata'] = metadata_extractor.parse_metadata(soup)
+    if 'theme' in analyses:
+        results['theme'] = theme_detector.identify_theme(response.text, soup)
+    if 'social' in analyses:
+        results['social_links'] = list(social_link_extractor.find_social_media_links(soup))
+    if 'words' in analyses:
+        results['top_words'] = most_common_words.count_top_words(soup, top_n)
+    if 'html' in analyses:
+        results['html_errors'] = html_validator.find_html_errors(soup)
+    if 'images' in analyses:
+        try:
+            results['broken_images'] = broken_image_finder.check_images(soup, url)
+        except requests.exceptions.RequestException as e:
+            print(f"\nError checking images: {e}")
+            results['broken_images'] = []
+    return results
+
+# Output the results to a file and print them to the console along with datetime program was run
+def output_results(url, results, output_file, format='txt', is_last=False):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    metadata = results.get('metadata', {})
+    top_words = [f"{text} ({count})" for text, count in results.get('top_words', [])]
+    if format == 'csv':
+        with open(output_file, "a", newline='', encoding="utf-8") as file:
+            csv_writer = csv.writer(file)
+            csv_writer.writerow([timestamp, url, metadata.get('title', ''), metadata.get('description', ''), metadata.get('keywords', ''), results.get('theme', ''),
+                                 '; '.join(results.get('social_links', [])), '; '.join(top_words), '; '.join(results.get('html_errors', [])), '; '.join(results.get('broken_images', []))])
+        print(f"Results saved to {output_file}")
+    elif format == 'json':
+        result_data = {'timestamp': timestamp, 'url': url}
+        result_data.update(results)
+        result_data['top_words'] = [{'text': text, 'count': count} for text, count in results.get('top_words', [])]
+        with open(output_file, "a", encoding="utf-8") as file:
+            json.dump(result_data, file, indent=4)
+            if not is_last:
+                file.write(",\n")
+            else:
+                file.write("\n")
+        print(f"Results saved to {output_file}")
+    else:
+        lines = [f"Timestamp: {timestamp}", f"URL: {url}"]
+        if 'metadata' in results:
+            lines += ["", "Metadata:"] + [f"{key}: {value}" for key, value in metadata.items()]
+        if 'theme' in results:
+            lines += ["", f"Detected theme/framework: {results['theme']}"]
+        if 'social_links' in results:
+            lines += ["", f"Number of social media links found: {len(results['social_links'])}"] + results['social_links']
+        if 'top_words' in results:
+            lines += ["", "Most common words:"] + [f"The text '{text}' appears {count} times on the page" for text, count in results['top_words']]
+        if 'html_errors' in results:
+            lines += ["", "Errors:"] + [f"- {error}" for error in results['html_errors']]
+        if 'broken_images' in results:
+            lines += ["", f"Total broken images: {len(results['broken_images'])}"] + results['broken_images']
+        with open(output_file, "a", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+            if not is_last:
+                file.write("\n")
+        print("\n" + "\n".join(lines))
+        print(f"\nResults saved to {output_file}")
+
+# Main Function used to gather input and call other functions
+# It will check for accessibility and empty text before continuing to output
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Page Analyzer Script")
+    parser.add_argument("urls", nargs='*', help="URL(s) to check (separated by commas)")
+    parser.add_argument("--analyses", default=','.join(ANALYSES), help=f"Comma-separated analyses to run (default: {','.join(ANALYSES)})")
+    parser.add_argument("--top", type=int, default=10, help="Number of most common words to report")
+    parser.add_argument("--parser", choices=PARSERS, help="HTML parser backend to use (default: html.parser, or the WEB_TOOLS_PARSER environment variable)")
+    parser.add_argument("--csv", action='store_true', help="Export results as CSV")
+    parser.add_argument("--json", action='store_true', help="Export results as JSON")
+    args = parser.parse_args()
+    if args.parser:
+        set_default_parser(args.parser)
+
+    analyses = [analysis.strip() for analysis in args.analyses.split(',') if analysis.strip()]
+    unknown = [analysis for analysis in analyses if analysis not in ANALYSES]
+    if unknown:
+        print(f"\nUnknown analyses: {', '.join(unknown)}. Choose from: {', '.join(ANALYSES)}. Exiting program.")
+        exit()
+
+    urls_input = ','.join(args.urls) if args.urls else input("\nEnter URL(s) to check (separated by commas): ")
+    urls = [url.strip() for url in urls_input.split(',') if url.strip()]
+
+    if not urls:
+        print("\nNo URL(s) provided. Exiting program.")
+        exit()
+        
+    export_csv = args.csv
+    export_json = args.json
+    
+    if not export_csv:
+        export_csv = input("Export results as CSV? (y/n): ").strip().lower() == 'y'
+    if not export_json:
+        export_json = input("Export results as JSON? (y/n): ").strip().lower() == 'y'
+    
+    with open("page_analyzer.txt", "w", encoding="utf-8") as file:
+        pass
+    if export_csv:
+        with open("page_analyzer.csv", "w", newline='', encoding="utf-8") as file:
+            csv_writer = csv.writer(file)
+            csv_writer.writerow(['Timestamp', 'URL', 'Title', 'Description', 'Keywords', 'Theme', 'Social Links', 'Top Words', 'HTML Errors', 'Broken Images'])
+    if export_json:
+        with open("page_analyzer.json", "w", encoding="utf-8") as file:
+            file.write('[')
+            file.write("\n")
+    
+    for i, url in enumerate(urls):
+        formatted_url = format_url(url)
+        if not is_allowed(formatted_url):
+            print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid.")
+            continue
+
+        results = analyze_page(formatted_url, analyses, args.top)
+        if results is None:
+            continue
+        is_last_url = i == len(urls) - 1
+        output_results(formatted_url, results, "page_analyzer.txt", is_last=is_last_url)
+        if export_csv:
+            output_results(formatted_url, results, "page_analyzer.csv", format='csv')
+        if export_json:
+            output_results(formatted_url, results, "page_analyzer.json", format='json', is_last=is_last_url)
+    
+    if export_json:
+        with open("page_analyzer.json", "a", encoding="utf-8") as file:
+            file.write(']')
@@ -5,14 +5,27 @@ This script iterates through a website at the given URL to identify and report a
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse, urlunparse, urljoin
 import requests
 import argparse
 import csv
 import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.cli import positive_float, positive_int
+from web_common.fetch import fetch, configure_session, POOL_MAXSIZE
+from web_common.parsing import make_soup
+from web_common.robots import is_allowed
+from web_common.scheduler import configure_scheduler, DEFAULT_RATE
+
+COMMIT_INTERVAL = 100
+PARSE_ONLY = SoupStrainer('a', href=True)
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -25,38 +38,168 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
-    try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except Exception:
-        return False
-        
+# Normalize a URL so that different spellings of the same page are only counted and crawled once
+# Lowercases the scheme and host, drops default ports and the fragment, and uses '/' for an empty path
+def normalize_url(url):
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    return urlunparse((scheme, netloc, parsed.path or '/', parsed.params, parsed.query, ''))
+
+# Returns the internal links found in the given soup, i.e. those that start with base_url once site-relative links are resolved
+def extract_internal_links(soup, base_url):
+    internal_links = set()
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        if href.startswith('/'):
+            href = urljoin(base_url, href)
+        if href.startswith(base_url):
+            internal_links.add(href)
+    return internal_links
+
 # Iterates through every link of the website at the given URL and returns a set of unique internal links (pages)
 def get_internal_links(url):
     internal_links = set()
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        response = fetch(url)
+        soup = make_soup(response.text, parse_only=PARSE_ONLY)
 
         base_url = '{uri.scheme}://{uri.netloc}'.format(uri=urlparse(url))
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            if href.startswith('/'):
-                href = urljoin(base_url, href)
-            if href.startswith(base_url):
-                internal_links.add(href)
+        internal_links = extract_internal_links(soup, base_url)
     except requests.exceptions.RequestException as e:
         print(f"\nError fetching URL: {e}")
     return internal_links
 
+# Fetches a single page during a crawl and returns its status code, internal links and HTML
+# Responses that are errors or not HTML are skipped and have no links and no HTML
+def get_page_links(url, base_url):
+    try:
+        response = fetch(url)
+        if response.status_code >= 400 or 'html' not in response.headers.get('Content-Type', 'text/html'):
+            return response.status_code, set(), None
+        html = response.text
+        soup = make_soup(html, parse_only=PARSE_ONLY)
+        return response.status_code, extract_internal_links(soup, base_url), html
+    except requests.exceptions.RequestException as e:
+        print(f"\nError fetching URL: {e}")
+        return None, set(), None
+
+# On-disk crawl state: the frontier, the set of pages already found and the status of each page, kept in SQLite
+# Pages move from 'queued' to 'fetching' to 'done' or 'error'; pages disallowed by robots.txt are stored as 'disallowed'
+# Iterating over the store yields the pages in the order they were found, without loading them all into memory
+class CrawlStore:
+    def __init__(self, path, start_url, resume=False):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS crawl (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY, url TEXT UNIQUE NOT NULL, depth INTEGER NOT NULL, status TEXT NOT NULL, http_status INTEGER)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_status ON pages (status, id)")
+
+        row = self.conn.execute("SELECT value FROM crawl WHERE key = 'start_url'").fetchone()
+        if resume and row and row[0] != start_url:
+            print(f"\nSaved crawl is for {row[0]}, not {start_url}. Starting a new crawl.")
+            resume = False
+        if resume:
+            self.conn.execute("UPDATE pages SET status = 'queued' WHERE status = 'fetching'")
+        else:
+            self.conn.execute("DELETE FROM pages")
+            self.conn.execute("INSERT OR REPLACE INTO crawl (key, value) VALUES ('start_url', ?)", (start_url,))
+        self.count = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        self.conn.commit()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for (url,) in self.conn.execute("SELECT url FROM pages ORDER BY id"):
+            yield url
+
+    # Adds a page to the store unless it has already been found
+    def add(self, url, depth, status='queued'):
+        cursor = self.conn.execute("INSERT OR IGNORE INTO pages (url, depth, status) VALUES (?, ?, ?)", (url, depth, status))
+        self.count += cursor.rowcount
+
+    # Takes up to limit queued pages shallower than max_depth off the frontier, oldest first, and marks them as being fetched
+    def take(self, limit, max_depth):
+        rows = self.conn.execute("SELECT url, depth FROM pages WHERE status = 'queued' AND depth < ? ORDER BY id LIMIT ?", (max_depth, limit)).fetchall()
+        self.conn.executemany("UPDATE pages SET status = 'fetching' WHERE url = ?", [(url,) for url, _ in rows])
+        return rows
+
+    # Yields the pages that were found but never fetched, such as those max_depth links away, in the order they were found
+    def queued(self):
+        for (url,) in self.conn.execute("SELECT url FROM pages WHERE status = 'queued' ORDER BY id").fetchall():
+            yield url
+
+    # Records the outcome of fetching a page
+    def finish(self, url, http_status):
+        status = 'done' if http_status is not None and http_status < 400 else 'error'
+        self.conn.execute("UPDATE pages SET status = ?, http_status = ? WHERE url = ?", (status, http_status, url))
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+# Crawls the website breadth-first from the given URL, recording the unique internal links (pages) found in store,
+# and yields each HTML page fetched as (url, html) as soon as it has been read, so other tools can use the pages of
+# a crawl without downloading them again
+# Pages up to max_depth links away from the start page are collected, but only those fewer than max_depth links away
+# are fetched for more links (following max_depth links at most); at most max_pages pages are collected,
+# and up to workers pages are fetched at the same time
+# The crawl state is committed to the store every COMMIT_INTERVAL pages and when the crawl stops
+def iter_crawl(url, store, max_depth=3, max_pages=1000, workers=8):
+    base_url = '{uri.scheme}://{uri.netloc}'.format(uri=urlparse(url))
+    if workers > POOL_MAXSIZE:
+        configure_session(pool_maxsize=workers)
+    store.add(normalize_url(url), 0)
+
+    pending = {}
+    processed = 0
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            if len(pending) < workers:
+                for page, depth in store.take(workers - len(pending), max_depth):
+                    pending[executor.submit(get_page_links, page, base_url)] = (page, depth)
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page, depth = pending.pop(future)
+                http_status, links, html = future.result()
+                store.finish(page, http_status)
+                for link in links:
+                    if len(store) >= max_pages:
+                        break
+                    link = normalize_url(link)
+                    store.add(link, depth + 1, 'queued' if is_allowed(link) else 'disallowed')
+
+                processed += 1
+                if processed % COMMIT_INTERVAL == 0:
+                    store.commit()
+                if html is not None:
+                    yield page, html
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        store.commit()
+
+# Crawls the website breadth-first from the given URL (see iter_crawl) and returns the store of unique internal links (pages) found
+# The crawl state is kept in state_file, so an interrupted crawl can be continued with resume
+def crawl_site(url, max_depth=3, max_pages=1000, workers=8, state_file="page_finder.db", resume=False):
+    store = CrawlStore(state_file, normalize_url(url), resume)
+    try:
+        for _ in iter_crawl(url, store, max_depth, max_pages, workers):
+            pass
+    except KeyboardInterrupt:
+        print("\nCrawl interrupted. Run again with --resume to continue where it stopped.")
+    return store
+
 # Output the results to a file and print them to the console along with datetime program was run
 def output_results(url, internal_links, output_file, format='txt'):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -89,7 +232,15 @@ if __name__ == "__main__":
     parser.add_argument("url", help="URL to check", nargs='?', default='')
     parser.add_argument("--csv", action='store_true', help="Export results as CSV")
     parser.add_argument("--json", action='store_true', help="Export results as JSON")
+    parser.add_argument("--crawl", action='store_true', help="Crawl the whole site instead of only the start page")
+    parser.add_argument("--max-depth", type=int, default=3, help="Maximum number of links to follow from the start page when crawling")
+    parser.add_argument("--max-pages", type=int, default=1000, help="Maximum number of pages to collect when crawling")
+    parser.add_argument("--workers", type=positive_int, default=8, help="Number of pages fetched at the same time when crawling")
+    parser.add_argument("--state-file", default="page_finder.db", help="File the crawl state is saved to")
+    parser.add_argument("--resume", action='store_true', help="Continue the crawl saved in the state file (implies --crawl)")
+    parser.add_argument("--rate", type=positive_float, default=DEFAULT_RATE, help="Maximum number of requests per second to the site")
     args = parser.parse_args()
+    configure_scheduler(rate=args.rate)
 
     if not args.url.strip():
         args.url = input("\nEnter a URL to check: ").strip()
@@ -103,7 +254,10 @@ if __name__ == "__main__":
         print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid. Exiting program.")
         exit()
 
-    internal_links = get_internal_links(formatted_url)
+    if args.crawl or args.resume:
+        internal_links = crawl_site(formatted_url, args.max_depth, args.max_pages, args.workers, args.state_file, args.resume)
+    else:
+        internal_links = get_internal_links(formatted_url)
     if internal_links:
         output_results(formatted_url, internal_links, "page_finder.txt")
 
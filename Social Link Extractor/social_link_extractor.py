@@ -5,14 +5,23 @@ This script extracts and reports social media links from a specified webpage
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse
 import requests
 import argparse
 import csv
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.export import prepend_csv_header
+from web_common.fetch import fetch
+from web_common.parsing import make_soup
+from web_common.robots import is_allowed
+
+PARSE_ONLY = SoupStrainer(href=True)
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -25,40 +34,30 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
-    try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except Exception:
-        return False
+# Finds social media URLs in a parsed webpage
+def find_social_media_links(soup):
+    social_media_links = set()
 
-# Extracts social media URLs from the webpage
-def extract_social_media_links(url):
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        social_media_links = set()
+    social_media_domains = [
+        'facebook.com', 'twitter.com', 'linkedin.com',
+        'instagram.com', 'youtube.com', 'pinterest.com',
+        'discord.gg', 'github.com', 'wa.me'
+    ]
 
-        social_media_domains = [
-            'facebook.com', 'twitter.com', 'linkedin.com',
-            'instagram.com', 'youtube.com', 'pinterest.com',
-            'discord.gg', 'github.com', 'wa.me'
-        ]
+    for tag in soup.find_all(href=True):
+        for domain in social_media_domains:
+            if domain in tag['href']:
+                social_media_links.add(tag['href'])
+                break
 
-        for tag in soup.find_all(href=True):
-            for domain in social_media_domains:
-                if domain in tag['href']:
-                    social_media_links.add(tag['href'])
-                    break
+    return social_media_links
 
-        return social_media_links
+# Extracts social media URLs from the webpage
+def extract_social_media_links(url):
+    try:
+        response = fetch(url)
+        soup = make_soup(response.text, parse_only=PARSE_ONLY)
+        return find_social_media_links(soup)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL: {e}")
         return set()
@@ -121,17 +120,18 @@ if __name__ == "__main__":
         pass
     if export_csv:
         with open("social_link_extractor.csv", "w", newline='', encoding="utf-8") as file:
-            csv_writer = csv.writer(file)
-            csv_writer.writerow(['Timestamp', 'Website', 'Number of Links'] + ['Link ' + str(i+1) for i in range(max(len(extract_social_media_links(format_url(url))) for url in urls))])
+            pass
     if export_json:
         with open("social_link_extractor.json", "w", encoding="utf-8") as file:
             file.write('[')
             file.write("\n")
     
+    max_links = 0
     for i, url in enumerate(urls):
         formatted_url = format_url(url)
         if is_allowed(formatted_url):
             social_media_links = extract_social_media_links(formatted_url)
+            max_links = max(max_links, len(social_media_links))
             is_last_url = i == len(urls) - 1
             output_results(formatted_url, social_media_links, "social_link_extractor.txt", is_last=is_last_url)
             if export_csv:
@@ -141,6 +141,8 @@ if __name__ == "__main__":
         else:
             print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid.")
     
+    if export_csv:
+        prepend_csv_header("social_link_extractor.csv", ['Timestamp', 'Website', 'Number of Links'] + ['Link ' + str(i+1) for i in range(max_links)])
     if export_json:
         with open("social_link_extractor.json", "a", encoding="utf-8") as file:
             file.write(']')
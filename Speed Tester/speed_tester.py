@@ -5,16 +5,71 @@ This script measures and reports the loading speed of a specified webpage using
 For full documentation, see the README in this tool's directory
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from time import time
-from urllib.robotparser import RobotFileParser
+from time import perf_counter, sleep
 from urllib.parse import urlparse
 import requests
 import argparse
+import asyncio
 import csv
 import json
+import os
+import queue
+import socket
+import ssl
+import sys
+
+try:
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+except ImportError:
+    webdriver = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.cli import positive_int
+from web_common.fetch import HEADERS
+from web_common.robots import is_allowed
+
+PAGE_LOAD_TIMEOUT = 30
+HTTP_TIMEOUT = 10
+MAX_RESOLVER_THREADS = 256
+CHUNK_SIZE = 65536
+SSL_CONTEXT = ssl.create_default_context()
+LOAD_EVENT_POLLS = 20
+STATISTICS = ['median', 'p90', 'p99', 'min', 'max']
+METRIC_LABELS = {
+    'dns': 'DNS',
+    'connect': 'Connect',
+    'tls': 'TLS',
+    'ttfb': 'TTFB',
+    'fcp': 'First Contentful Paint',
+    'dom_content_loaded': 'DOMContentLoaded',
+    'load': 'Load',
+    'download': 'Download',
+    'total': 'Total'
+}
+MODE_LABELS = {'cold': 'Cold cache', 'warm': 'Warm cache', 'http': 'HTTP'}
+
+# Reads the page's Navigation Timing and Paint Timing entries; phases are durations and milestones are measured
+# from the start of the navigation, all in milliseconds
+TIMING_SCRIPT = """
+const navigation = performance.getEntriesByType('navigation')[0];
+if (!navigation) {
+    return null;
+}
+const paint = performance.getEntriesByName('first-contentful-paint')[0];
+return {
+    dns: navigation.domainLookupEnd - navigation.domainLookupStart,
+    connect: (navigation.secureConnectionStart || navigation.connectEnd) - navigation.connectStart,
+    tls: navigation.secureConnectionStart > 0 ? navigation.connectEnd - navigation.secureConnectionStart : 0,
+    ttfb: navigation.responseStart > 0 ? navigation.responseStart - navigation.startTime : null,
+    fcp: paint ? paint.startTime : null,
+    dom_content_loaded: navigation.domContentLoadedEventEnd > 0 ? navigation.domContentLoadedEventEnd - navigation.startTime : null,
+    load: navigation.loadEventEnd > 0 ? navigation.loadEventEnd - navigation.startTime : null
+};
+"""
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -27,44 +82,244 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
-    try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except Exception:
-        return False
-
-# Measures the loading speed of a webpage using Selenium
-def measure_loading_speed(url):
+# Starts a headless Chrome driver for the pool
+def create_driver():
+    if webdriver is None:
+        raise ImportError("Measuring pages in a browser needs the selenium package: pip install selenium")
+    options = Options()
+    options.add_argument('--headless=new')
+    driver = webdriver.Chrome(options=options)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    return driver
+
+# Clears the browser cache, cookies and site storage left by the last page, so the next page loads as in a fresh browser
+def reset_driver(driver):
+    origin = '{uri.scheme}://{uri.netloc}'.format(uri=urlparse(driver.current_url))
+    if origin.startswith(('http://', 'https://')):
+        driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+    driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+    driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+    driver.get('about:blank')
+
+# Pool of long-lived headless Chrome drivers shared by the worker threads
+# Starting Chrome takes far longer than loading most pages, so each driver is started once and reused for many URLs;
+# a driver is reset before it goes back to the pool, and replaced if a page left it in a bad state
+class DriverPool:
+    def __init__(self, size):
+        self.drivers = queue.Queue()
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            futures = [executor.submit(create_driver) for _ in range(size)]
+        try:
+            for future in futures:
+                self.drivers.put(future.result())
+        except Exception:
+            # Quit every browser that did start, so a failed start-up leaves no headless Chrome processes behind
+            for future in futures:
+                if future.exception() is None:
+                    future.result().quit()
+            raise
+
+    # Lends a driver to the caller for one page
+    @contextmanager
+    def driver(self):
+        driver = self.drivers.get()
+        healthy = False
+        try:
+            if driver is None:
+                driver = create_driver()
+            yield driver
+            reset_driver(driver)
+            healthy = True
+        finally:
+            if not healthy:
+                driver = self.replace(driver)
+            self.drivers.put(driver)
+
+    # Quits a driver that failed and starts a new one in its place, or returns None to retry on the next use
+    def replace(self, driver):
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        try:
+            return create_driver()
+        except Exception as e:
+            print(f"Error starting a browser: {e}")
+            return None
+
+    def close(self):
+        while not self.drivers.empty():
+            driver = self.drivers.get_nowait()
+            if driver is not None:
+                driver.quit()
+
+# Loads the page and returns its timings, waiting briefly for the load event to finish if it has not yet
+# A milestone that has not been reached yet (its end time is still 0) is None, so it is left out of the statistics
+def load_timings(driver, url):
+    driver.get(url)
+    for _ in range(LOAD_EVENT_POLLS):
+        timings = driver.execute_script(TIMING_SCRIPT)
+        if timings is None or timings['load'] is not None:
+            return timings
+        sleep(0.1)
+    return timings
+
+# Interpolates the value below which the given fraction of the sorted values fall
+def percentile(values, fraction):
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+# Summarises the samples of each metric as median, p90, p99, min and max
+def summarize(samples):
+    summary = {}
+    for metric in METRIC_LABELS:
+        values = sorted(sample[metric] for sample in samples if sample and sample.get(metric) is not None)
+        if values:
+            stats = [percentile(values, 0.5), percentile(values, 0.9), percentile(values, 0.99), values[0], values[-1]]
+            summary[metric] = dict(zip(STATISTICS, [round(value, 1) for value in stats]))
+    return summary
+
+# Measures the loading speed of a webpage using a driver from the pool
+# The page is loaded runs times with a cold cache (cache, cookies and storage cleared first), each load followed by
+# one with the warm cache it left behind; returns the timings of both summarised, and the median cold load in seconds
+def measure_loading_speed(url, pool, runs=3):
     try:
-        options = Options()
-        options.headless = True
-        driver = webdriver.Chrome(options=options)
-        start_time = time()
-        driver.get(url)
-        end_time = time()
-        driver.quit()
-        return end_time - start_time
+        cold = []
+        warm = []
+        with pool.driver() as driver:
+            for _ in range(runs):
+                reset_driver(driver)
+                cold.append(load_timings(driver, url))
+                warm.append(load_timings(driver, url))
+        timings = {'runs': runs, 'modes': {'cold': summarize(cold), 'warm': summarize(warm)}}
+        load = timings['modes']['cold'].get('load')
+        timings['loading_time'] = load['median'] / 1000 if load else None
+        return timings
     except Exception as e:
         print(f"Error: {e}")
         return None
 
+# Measures the loading speed of every URL, spread across the drivers of the pool, and yields the results in URL order
+def measure_all(urls, pool, workers, runs=3):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from zip(urls, executor.map(lambda url: measure_loading_speed(url, pool, runs), urls))
+
+# Looks up a host with the system resolver and returns its first address with the time the lookup took, in milliseconds
+# Runs in a resolver thread and is timed there, so time spent waiting for a free thread is not counted as DNS
+def resolve(host, port):
+    start = perf_counter()
+    address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+    return address, (perf_counter() - start) * 1000
+
+# Times one request for the raw document over a new connection, without a browser, in milliseconds: the DNS lookup,
+# TCP connect and TLS handshake, the time to first byte after the request was sent, the download of the rest and the total
+# Each phase is timed around its own step (getaddrinfo in the resolver pool, socket connect, TLS wrap, first read),
+# the total is their sum, and redirects are not followed
+async def time_http_request(url, resolver=None):
+    parsed = urlparse(url)
+    secure = parsed.scheme == 'https'
+    port = parsed.port or (443 if secure else 80)
+    path = (parsed.path or '/') + (f'?{parsed.query}' if parsed.query else '')
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: {parsed.netloc.rpartition('@')[2]}\r\nUser-Agent: {HEADERS['User-Agent']}\r\n"
+        "Accept: text/html,*/*\r\nAccept-Encoding: gzip, deflate\r\nConnection: close\r\n\r\n"
+    ).encode('latin-1')
+    loop = asyncio.get_running_loop()
+
+    (family, socket_type, protocol, _, address), dns = await loop.run_in_executor(resolver, resolve, parsed.hostname, port)
+    resolved = perf_counter()
+    sock = socket.socket(family, socket_type, protocol)
+    sock.setblocking(False)
+    writer = None
+    try:
+        await loop.sock_connect(sock, address)
+        connected = perf_counter()
+        reader, writer = await asyncio.open_connection(sock=sock, ssl=SSL_CONTEXT if secure else None, server_hostname=parsed.hostname if secure else None)
+        handshaken = perf_counter()
+        writer.write(request)
+        await writer.drain()
+        sent = perf_counter()
+        status_line = await reader.readline()
+        first_byte = perf_counter()
+        size = len(status_line)
+        while True:
+            chunk = await reader.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+        done = perf_counter()
+    finally:
+        if writer is not None:
+            writer.close()
+        else:
+            sock.close()
+
+    return {
+        'status': int(status_line.split()[1]),
+        'bytes': size,
+        'dns': dns,
+        'connect': (connected - resolved) * 1000,
+        'tls': (handshaken - connected) * 1000 if secure else None,
+        'ttfb': (first_byte - sent) * 1000,
+        'download': (done - first_byte) * 1000,
+        'total': dns + (done - resolved) * 1000
+    }
+
+# Checks robots.txt and times every URL runs times without a browser, with at most max_concurrency requests in flight
+# overall and at most max_per_host against any single host; the robots.txt checks and DNS lookups run in a pool of
+# resolver threads sized to match, under the same limits, so they do not hold up the requests
+# Returns the summarised timings of each URL in URL order, None for a URL whose requests failed,
+# or False for a URL disallowed by robots.txt
+async def measure_http_all(urls, runs=3, max_concurrency=200, max_per_host=8):
+    loop = asyncio.get_running_loop()
+    global_limit = asyncio.Semaphore(max_concurrency)
+    host_limits = {}
+
+    async def measure(url):
+        host_limit = host_limits.setdefault(urlparse(url).netloc, asyncio.Semaphore(max_per_host))
+        async with host_limit, global_limit:
+            if not await loop.run_in_executor(resolver, is_allowed, url):
+                return False
+        samples = []
+        try:
+            for _ in range(runs):
+                async with host_limit, global_limit:
+                    samples.append(await asyncio.wait_for(time_http_request(url, resolver), HTTP_TIMEOUT))
+        except Exception as e:
+            print(f"Error: {url} - {e!r}")
+            return None
+        timings = {'runs': runs, 'status': samples[-1]['status'], 'modes': {'http': summarize(samples)}}
+        timings['loading_time'] = timings['modes']['http']['total']['median'] / 1000
+        return timings
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, MAX_RESOLVER_THREADS)) as resolver:
+        return await asyncio.gather(*(measure(url) for url in urls))
+
 # Output the results to a file and print them to the console along with datetime program was run
-def output_results(url, loading_time, output_file, format='txt', is_last=False):
+# timings holds the summary of each cache mode's metrics (see measure_loading_speed), or is None if the page failed
+def output_results(url, timings, output_file, format='txt', is_last=False):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    loading_time = timings['loading_time'] if timings else None
     rounded_loading_time = round(loading_time, 2) if loading_time is not None else None
+    modes = timings['modes'] if timings else {}
     if format == 'csv':
         with open(output_file, "a", newline='', encoding="utf-8") as file:
             csv_writer = csv.writer(file)
-            csv_writer.writerow([timestamp, url, rounded_loading_time])
+            if not modes:
+                csv_writer.writerow([timestamp, url, rounded_loading_time])
+            for mode, summary in modes.items():
+                for metric, stats in summary.items():
+                    csv_writer.writerow([timestamp, url, rounded_loading_time, timings['runs'], mode, METRIC_LABELS[metric]] + [stats[stat] for stat in STATISTICS])
     elif format == 'json':
         result_data = {'timestamp': timestamp, 'url': url, 'loading_time': rounded_loading_time}
+        if timings:
+            result_data['runs'] = timings['runs']
+            if 'status' in timings:
+                result_data['status'] = timings['status']
+            result_data.update(modes)
         with open(output_file, "a", encoding="utf-8") as file:
             json.dump(result_data, file, indent=4)
             if not is_last:
@@ -72,11 +327,23 @@ def output_results(url, loading_time, output_file, format='txt', is_last=False):
             else:
                 file.write("\n")
     else:
+        lines = [f"Timestamp: {timestamp}", f"URL: {url}"]
+        if loading_time is not None:
+            samples = 'requests' if 'http' in modes else 'cold cache loads'
+            lines.append(f"Loading Time: {loading_time:.2f} seconds (median of {timings['runs']} {samples})")
+        elif not modes:
+            lines.append("Loading Time: failed")
+        if timings and 'status' in timings:
+            lines.append(f"Status: {timings['status']}")
+        for mode, summary in modes.items():
+            lines.append(f"{MODE_LABELS[mode]}, {timings['runs']} runs (ms):".ljust(32) + ''.join(stat.rjust(10) for stat in STATISTICS))
+            for metric, stats in summary.items():
+                lines.append(f"  {METRIC_LABELS[metric]}".ljust(32) + ''.join(f"{stats[stat]:>10.1f}" for stat in STATISTICS))
         with open(output_file, "a", encoding="utf-8") as file:
-            file.write(f"Timestamp: {timestamp}\nURL: {url}\nLoading Time: {loading_time:.2f} seconds")
+            file.write('\n'.join(lines))
             if not is_last:
                 file.write("\n\n")
-        print(f"\nTimestamp: {timestamp}\nURL: {url}\nLoading Time: {loading_time:.2f} seconds")
+        print('\n' + '\n'.join(lines))
         print(f"Results saved to {output_file}")
 
 # Main Function used to gather input and call other functions
@@ -86,6 +353,11 @@ if __name__ == "__main__":
     parser.add_argument("urls", nargs='*', help="URL(s) to check (separated by commas)")
     parser.add_argument("--csv", action='store_true', help="Export results as CSV")
     parser.add_argument("--json", action='store_true', help="Export results as JSON")
+    parser.add_argument("--browsers", type=positive_int, default=4, help="Number of headless browsers loading pages at the same time")
+    parser.add_argument("--runs", type=positive_int, default=3, help="Number of cold cache and warm cache loads of each page")
+    parser.add_argument("--http", action='store_true', help="Time the raw HTTP request for each page instead of loading it in a browser")
+    parser.add_argument("--concurrency", type=positive_int, default=200, help="Maximum number of requests in flight at once with --http")
+    parser.add_argument("--per-host", type=positive_int, default=8, help="Maximum number of requests in flight to a single host with --http")
     args = parser.parse_args()
 
     urls_input = ','.join(args.urls) if args.urls else input("\nEnter URL(s) to check (separated by commas): ")
@@ -108,25 +380,49 @@ if __name__ == "__main__":
     if export_csv:
         with open("speed_tester.csv", "w", newline='', encoding="utf-8") as file:
             csv_writer = csv.writer(file)
-            csv_writer.writerow(['Timestamp', 'Website', 'Loading Time'])
+            csv_writer.writerow(['Timestamp', 'Website', 'Loading Time', 'Runs', 'Cache', 'Metric', 'Median (ms)', 'P90 (ms)', 'P99 (ms)', 'Min (ms)', 'Max (ms)'])
     if export_json:
         with open("speed_tester.json", "w", encoding="utf-8") as file:
             file.write('[')
             file.write("\n")
     
-    for i, url in enumerate(urls):
-        formatted_url = format_url(url)
-        if is_allowed(formatted_url):
-            loading_time = measure_loading_speed(formatted_url)
-            is_last_url = i == len(urls) - 1
-            output_results(formatted_url, loading_time, "speed_tester.txt", is_last=is_last_url)
-            if export_csv:
-                output_results(formatted_url, loading_time, "speed_tester.csv", format='csv')
-            if export_json:
-                output_results(formatted_url, loading_time, "speed_tester.json", format='json', is_last=is_last_url)
-        else:
-            print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid.")
-    
+    formatted_urls = [format_url(url) for url in urls]
+    if args.http:
+        # robots.txt is checked inside the asynchronous run, concurrently with the requests, rather than one host at a time first
+        measured = zip(formatted_urls, asyncio.run(measure_http_all(formatted_urls, args.runs, args.concurrency, args.per_host)))
+        results = []
+        for formatted_url, timings in measured:
+            if timings is False:
+                print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid.")
+            else:
+                results.append((formatted_url, timings))
+        allowed_urls = [formatted_url for formatted_url, _ in results]
+    else:
+        allowed_urls = []
+        for formatted_url in formatted_urls:
+            if is_allowed(formatted_url):
+                allowed_urls.append(formatted_url)
+            else:
+                print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid.")
+
+    if allowed_urls:
+        pool = None
+        try:
+            if not args.http:
+                browsers = min(args.browsers, len(allowed_urls))
+                pool = DriverPool(browsers)
+                results = measure_all(allowed_urls, pool, browsers, args.runs)
+            for i, (formatted_url, loading_time) in enumerate(results):
+                is_last_url = i == len(allowed_urls) - 1
+                output_results(formatted_url, loading_time, "speed_tester.txt", is_last=is_last_url)
+                if export_csv:
+                    output_results(formatted_url, loading_time, "speed_tester.csv", format='csv')
+                if export_json:
+                    output_results(formatted_url, loading_time, "speed_tester.json", format='json', is_last=is_last_url)
+        finally:
+            if pool is not None:
+                pool.close()
+
     if export_json:
         with open("speed_tester.json", "a", encoding="utf-8") as file:
             file.write(']')
@@ -5,13 +5,33 @@ This script extracts the main text content from a given webpage, removing all HT
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
+from html.parser import HTMLParser
+from pathlib import Path
 from urllib.parse import urlparse
 import requests
 import argparse
-import re
+import codecs
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.crawl import crawl_pages
+from web_common.fetch import fetch
+from web_common.robots import is_allowed
+
+CHUNK_SIZE = 8192
+BOILERPLATE_SHARE = 0.5
+MIN_PAGES = 3
+SKIPPED_TAGS = {'script', 'style', 'template'}
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption', 'figure', 'footer', 'form',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'td',
+    'th', 'title', 'tr', 'ul'
+}
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -24,59 +44,228 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
-    try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except Exception:
-        return False
-        
-# Fetches the content of the webpage at the given URL and returns the text content with preserved structure
-def get_stripped_content(url):
+# Writes the text of an HTML document as it is parsed, one line per block-level element
+# Text is passed to write as soon as the tag after it has been read, so only the current run of text between two tags
+# is kept; the parser may hand over a run in several pieces (for example at the boundary between two chunks fed to it),
+# so the pieces are joined before whitespace is collapsed and a word split across chunks comes out whole
+# Runs of whitespace become single spaces and script, style and template contents, comments and doctypes are left out
+class TextExtractor(HTMLParser):
+    def __init__(self, write):
+        super().__init__()
+        self.write = write
+        self.skip_depth = 0
+        self.text_parts = []
+        self.line_started = False
+        self.break_pending = False
+
+    def handle_starttag(self, tag, attrs):
+        self.flush_text()
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.break_pending = True
+
+    def handle_startendtag(self, tag, attrs):
+        self.flush_text()
+        if tag in BLOCK_TAGS:
+            self.break_pending = True
+
+    def handle_endtag(self, tag):
+        self.flush_text()
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self.break_pending = True
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.text_parts.append(data)
+
+    # Write out the run of text read since the last tag, with its whitespace collapsed
+    def flush_text(self):
+        text = ' '.join(''.join(self.text_parts).split())
+        self.text_parts = []
+        if not text:
+            return
+        if self.line_started:
+            self.write('\n' if self.break_pending else ' ')
+        self.write(text)
+        self.line_started = True
+        self.break_pending = False
+
+    def close(self):
+        super().close()
+        self.flush_text()
+
+# Streams the text content of a fetched page to write, reading the body in chunks so memory stays flat on large pages
+def write_stripped_content(response, write):
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    extractor = TextExtractor(write)
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        extractor.feed(decoder.decode(chunk))
+    extractor.feed(decoder.decode(b'', final=True))
+    extractor.close()
+
+# Writes the text content of a page whose HTML has already been downloaded, such as a page of a crawl
+def write_stripped_html(html, write):
+    extractor = TextExtractor(write)
+    extractor.feed(html)
+    extractor.close()
+
+# Fingerprint of a block of text, ignoring case
+def block_hash(line):
+    return hashlib.blake2b(line.lower().encode('utf-8'), digest_size=8).hexdigest()
+
+# On-disk index of the text blocks seen on each page of a site, kept in SQLite so later runs can reuse what was learned
+# A block found on at least BOILERPLATE_SHARE of the pages (and MIN_PAGES pages have been learned) is site template:
+# navigation, headers, footers, cookie banners and the like
+# With read_only, an existing index is opened for lookups only and is left exactly as it was
+class BlockIndex:
+    def __init__(self, path, read_only=False):
+        self.read_only = read_only
+        if read_only:
+            self.conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        else:
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, blocks TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS blocks (hash TEXT PRIMARY KEY, pages INTEGER NOT NULL)")
+        self.page_count = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def __len__(self):
+        return self.page_count
+
+    # Records which blocks appear on a page, replacing what an earlier run learned from the same page
+    def learn(self, url, lines):
+        hashes = {block_hash(line) for line in lines if line}
+        row = self.conn.execute("SELECT blocks FROM pages WHERE url = ?", (url,)).fetchone()
+        if row:
+            self.conn.executemany("UPDATE blocks SET pages = pages - 1 WHERE hash = ?", [(hash,) for hash in row[0].split()])
+        else:
+            self.page_count += 1
+        self.conn.executemany("INSERT INTO blocks (hash, pages) VALUES (?, 1) ON CONFLICT (hash) DO UPDATE SET pages = pages + 1", [(hash,) for hash in hashes])
+        self.conn.execute("INSERT OR REPLACE INTO pages (url, blocks) VALUES (?, ?)", (url, ' '.join(hashes)))
+
+    # Checks whether a block is part of the site template
+    def is_boilerplate(self, line):
+        if self.page_count < MIN_PAGES:
+            return False
+        row = self.conn.execute("SELECT pages FROM blocks WHERE hash = ?", (block_hash(line),)).fetchone()
+        return row is not None and row[0] >= BOILERPLATE_SHARE * self.page_count
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        if not self.read_only:
+            self.conn.execute("DELETE FROM blocks WHERE pages <= 0")
+            self.conn.commit()
+        self.conn.close()
+
+# Output the results to a file and print them to the console along with datetime program was run
+# The text is written to the file and the console while the page is still downloading; the file is only created
+# once the page's first text arrives, so a page without text leaves no output
+def output_results(url, output_file):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    file = None
+
+    def write(text):
+        nonlocal file
+        if file is None:
+            file = open(output_file, "w", encoding="utf-8")
+            file.write(f"Timestamp: {timestamp}\nURL: {url}\n\n")
+            print(f"\nTimestamp: {timestamp}\nURL: {url}\n")
+        file.write(text)
+        print(text, end='')
+
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        for script_or_style in soup(['script', 'style']):
-            script_or_style.decompose()
-
-        # Extract text from the soup object, adding newlines after block-level elements
-        lines = []
-        for element in soup.descendants:
-            if isinstance(element, str):
-                lines.append(element.strip())
-            elif element.name in ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div', 'li', 'br']:
-                lines.append('\n')
-
-        text = ' '.join(lines).strip()
-        text = re.sub(r'\n+', '\n', text)
-        return text
+        with fetch(url, stream=True) as response:
+            write_stripped_content(response, write)
     except requests.exceptions.RequestException as e:
         print(f"\nError fetching URL: {e}")
-        return None
+        return
+    finally:
+        if file is not None:
+            file.close()
+    if file is not None:
+        print(f"\n\nResults saved to {output_file}")
 
-# Output the results to a file and print them to the console along with datetime program was run
-def output_results(url, content, output_file):
+# Output the main content of several pages to a file and print it to the console along with datetime program was run
+# corpus yields (url, html) pairs: pages already downloaded, such as those of a crawl, carry their HTML and pages with None are fetched
+# Every page is stripped into a temporary file and its blocks are added to the block index; then each page is written
+# without the blocks the index marks as site template. Only the page being processed is read at a time, so memory
+# stays flat however many pages there are. Without learn, the index is only read, so a one-off page does not change it
+def output_site_results(corpus, output_file, index_file, learn=True):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(output_file, "w", encoding="utf-8") as file:
-        file.write(f"Timestamp: {timestamp}\nURL: {url}\n\n{content}")
-    print(f"\nTimestamp: {timestamp}\nURL: {url}\n\n{content}")
-    print(f"\nResults saved to {output_file}")
+    index = BlockIndex(index_file, read_only=not learn)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pages = []
+        for url, html in corpus:
+            path = os.path.join(temp_dir, f"{len(pages)}.txt")
+            if html is not None:
+                with open(path, "w", encoding="utf-8") as file:
+                    write_stripped_html(html, file.write)
+            else:
+                if not is_allowed(url):
+                    print(f"Skipping {url}, disallowed by robots.txt")
+                    continue
+                try:
+                    with fetch(url, stream=True) as response:
+                        if response.status_code >= 400 or 'html' not in response.headers.get('Content-Type', 'text/html'):
+                            continue
+                        with open(path, "w", encoding="utf-8") as file:
+                            write_stripped_content(response, file.write)
+                except requests.exceptions.RequestException as e:
+                    print(f"\nError fetching URL {url}: {e}")
+                    continue
+            if learn:
+                with open(path, encoding="utf-8") as file:
+                    index.learn(url, (line.rstrip('\n') for line in file))
+            pages.append((url, path))
+        if learn:
+            index.commit()
+
+        with open(output_file, "w", encoding="utf-8") as file:
+            file.write(f"Timestamp: {timestamp}\n")
+            print(f"\nTimestamp: {timestamp}")
+            for url, path in pages:
+                file.write(f"\nURL: {url}\n\n")
+                print(f"\nURL: {url}\n")
+                with open(path, encoding="utf-8") as page:
+                    for line in page:
+                        line = line.rstrip('\n')
+                        if line and not index.is_boilerplate(line):
+                            file.write(line + '\n')
+                            print(line)
+    if learn:
+        print(f"\nLearned blocks from {len(index)} pages in {index_file}")
+    else:
+        print(f"\nUsed the blocks learned from {len(index)} pages in {index_file}")
+    index.close()
+    print(f"Results saved to {output_file}")
 
 # Main Function used to gather input and call other functions
 # It will check for accessibility and empty text before continuing to output
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Stripped Content Script")
     parser.add_argument("url", help="URL to check", nargs='?', default='')
+    parser.add_argument("--urls", help="File with one URL per line to strip, leaving out the text the pages share")
+    parser.add_argument("--crawl", action='store_true', help="Crawl the site from the URL and strip every page found, leaving out the text the pages share")
+    parser.add_argument("--max-depth", type=int, default=3, help="Maximum number of links to follow from the start page when crawling")
+    parser.add_argument("--max-pages", type=int, default=1000, help="Maximum number of pages to collect when crawling")
+    parser.add_argument("--index", help="Block index file used to recognise site template text (default stripped_content_index.db for a list or crawl)")
     args = parser.parse_args()
 
+    if args.urls:
+        with open(args.urls, encoding="utf-8") as file:
+            corpus = [(format_url(line.strip()), None) for line in file if line.strip()]
+        if not corpus:
+            print("\nNo URLs found in the URL list. Exiting program.")
+            exit()
+        output_site_results(corpus, "stripped_content.txt", args.index or "stripped_content_index.db")
+        exit()
+
     if not args.url.strip():
         args.url = input("\nEnter a URL to check: ").strip()
     
@@ -88,7 +277,14 @@ if __name__ == "__main__":
     if not is_allowed(formatted_url):
         print(f"\nAccess to {formatted_url} is disallowed by robots.txt or the URL is invalid. Exiting program.")
         exit()
-    
-    content = get_stripped_content(formatted_url)
-    if content:
-        output_results(formatted_url, content, "stripped_content.txt")
+
+    if args.crawl:
+        corpus = crawl_pages(formatted_url, args.max_depth, args.max_pages, state_file="stripped_content.db")
+        output_site_results(corpus, "stripped_content.txt", args.index or "stripped_content_index.db")
+    elif args.index:
+        if not os.path.exists(args.index):
+            print(f"\nNo block index found at {args.index}. Build one with --urls or --crawl first. Exiting program.")
+            exit()
+        output_site_results([(formatted_url, None)], "stripped_content.txt", args.index, learn=False)
+    else:
+        output_results(formatted_url, "stripped_content.txt")
@@ -0,0 +1,93 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Tests for the streaming text extraction of Stripped Content
+Run with: python -m unittest discover -s "Stripped Content" (or pytest)
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stripped_content import block_hash, write_stripped_content, write_stripped_html, BlockIndex, CHUNK_SIZE
+
+# Stands in for a streamed requests.Response, handing out the body in chunks of the given size
+class ChunkedResponse:
+    def __init__(self, html, chunk_size=CHUNK_SIZE, encoding='utf-8'):
+        self.body = html.encode(encoding)
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+# Strip a document through the streaming path and return the text written
+def stream_text(html, chunk_size=CHUNK_SIZE):
+    parts = []
+    write_stripped_content(ChunkedResponse(html, chunk_size), parts.append)
+    return ''.join(parts)
+
+# Strip a whole document at once and return the text written
+def whole_text(html):
+    parts = []
+    write_stripped_html(html, parts.append)
+    return ''.join(parts)
+
+class StreamingTest(unittest.TestCase):
+    def test_word_across_chunk_boundary_is_not_split(self):
+        html = "<html><body><p>" + "word " * 2000 + "</p></body></html>"
+        streamed = stream_text(html)
+        self.assertEqual(streamed, whole_text(html))
+        self.assertEqual(streamed.split(), ['word'] * 2000)
+
+    def test_streamed_and_whole_outputs_match_for_any_chunk_size(self):
+        html = (
+            "<html><head><title>Site</title><style>p { color: red }</style></head><body>"
+            "<nav><a href='/'>Home</a> <a href='/about'>About</a></nav>"
+            "<p>Café &amp; <b>bold</b>text, spread   over\nlines</p><script>var x = '<p>';</script>"
+            "<ul><li>one</li><li>two</li></ul><footer>Copyright</footer></body></html>"
+        )
+        expected = whole_text(html)
+        self.assertEqual(expected, "Site\nHome About\nCafé & bold text, spread over lines\none\ntwo\nCopyright")
+        for chunk_size in (1, 2, 3, 5, 7, 64):
+            self.assertEqual(stream_text(html, chunk_size), expected, f"chunk size {chunk_size}")
+
+# A site page whose navigation text is long enough to cross a CHUNK_SIZE boundary when streamed
+def site_page(content):
+    nav = ' '.join(f"Section{number}" for number in range(1000))
+    return f"<html><body><nav>{nav}</nav><main><p>{content}</p></main><footer>Copyright Example Ltd</footer></body></html>"
+
+# The block hashes of the lines of stripped text, as BlockIndex.learn records them
+def block_hashes(text):
+    return {block_hash(line) for line in text.split('\n') if line}
+
+# Pages of a --urls run (or the depth-limit pages of a crawl) are streamed, while crawled pages are stripped whole,
+# so the template text of a page must hash the same whichever way it was loaded
+class BlockHashTest(unittest.TestCase):
+    def test_same_page_has_same_block_hashes_through_both_paths(self):
+        html = site_page("Only on this page")
+        self.assertGreater(len(html.encode('utf-8')), CHUNK_SIZE)
+        self.assertEqual(block_hashes(stream_text(html)), block_hashes(whole_text(html)))
+
+    def test_template_blocks_are_boilerplate_across_both_paths(self):
+        pages = {
+            'https://example.com/a': stream_text(site_page("First page")),
+            'https://example.com/b': whole_text(site_page("Second page")),
+            'https://example.com/c': stream_text(site_page("Third page"))
+        }
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index = BlockIndex(os.path.join(temp_dir, "index.db"))
+            try:
+                for url, text in pages.items():
+                    index.learn(url, text.split('\n'))
+                index.commit()
+                lines = pages['https://example.com/b'].split('\n')
+                self.assertEqual([line for line in lines if not index.is_boilerplate(line)], ["Second page"])
+            finally:
+                index.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,14 +5,22 @@ This script detects the theme or framework used by a website, identifying popula
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse
 import requests
 import argparse
 import csv
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.fetch import fetch
+from web_common.parsing import make_soup
+from web_common.robots import is_allowed
+
+PARSE_ONLY = SoupStrainer('link', href=True)
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -25,32 +33,21 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
-    try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except Exception:
-        return False
+# Identify the theme or framework from a webpage's HTML and its parsed soup
+def identify_theme(html, soup):
+    if "wp-content" in html:
+        return "WordPress"
+    for link in soup.find_all("link", href=True):
+        if "bootstrap" in link["href"]:
+            return "Bootstrap"
+    return "Unknown"
 
 # Detect the theme or framework used by the website
 def detect_theme(url):
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        if "wp-content" in response.text:
-            return "WordPress"
-        for link in soup.find_all("link", href=True):
-            if "bootstrap" in link["href"]:
-                return "Bootstrap"
-        return "Unknown"
+        response = fetch(url)
+        soup = make_soup(response.text, parse_only=PARSE_ONLY)
+        return identify_theme(response.text, soup)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL: {e}")
         return None
@@ -5,15 +5,20 @@ This script counts the occurrences of specified words on a web page
 For full documentation, see the README in this tool's directory
 """
 
-from bs4 import BeautifulSoup
+from collections import deque
 from datetime import datetime
-from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse
 import requests
 import argparse
 import csv
 import json
-import re
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.fetch import fetch
+from web_common.parsing import element_id, make_soup, strings_with_parents
+from web_common.robots import is_allowed
 
 # Add 'https://' to the URL if it doesn't have a scheme
 # Append '.com' if the URL doesn't have a domain extension
@@ -26,56 +31,175 @@ def format_url(url):
         url += '.com'
     return url
 
-# Check if the website's robots.txt file allows the given URL to be scraped
-def is_allowed(url):
-    try:
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch('*', url)
-    except Exception:
-        return False
-
-# Count the occurrences of each text string in the specified tag (or the entire body if no tag is specified)
-def count_text_occurrences(url, texts, tag=None):
-    text_count = {}
+# Build an Aho-Corasick automaton for the given terms
+# Returns the goto transitions, the failure links and, for each state, the terms that end there
+def build_automaton(terms):
+    goto = [{}]
+    fail = [0]
+    output = [[]]
+    for term in terms:
+        state = 0
+        for char in term:
+            if char not in goto[state]:
+                goto[state][char] = len(goto)
+                goto.append({})
+                fail.append(0)
+                output.append([])
+            state = goto[state][char]
+        output[state].append(term)
+
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, next_state in goto[state].items():
+            queue.append(next_state)
+            fallback = fail[state]
+            while fallback and char not in goto[fallback]:
+                fallback = fail[fallback]
+            fail[next_state] = goto[fallback].get(char, 0)
+            output[next_state] = output[next_state] + output[fail[next_state]]
+    return goto, fail, output
+
+# Whole-word counter for a fixed set of terms that is fed text in pieces, so long texts never have to be joined
+# Counts the same as len(re.findall(r'\b' + re.escape(term) + r'\b', text)) on the concatenated text: an occurrence
+# counts when it has a word boundary on both sides and does not overlap the previous counted occurrence of the same term
+class TermCounter:
+    def __init__(self, terms, automaton=None):
+        self.counts = {term: 0 for term in terms}
+        self.last_end = {term: 0 for term in self.counts}
+        self.goto, self.fail, self.output = automaton or build_automaton([term for term in self.counts if term])
+        self.state = 0
+        self.position = 0
+        self.word_flags = deque(maxlen=max(map(len, self.counts), default=0) + 1)
+        self.pending = []
+
+    # Check whether the character at the given position was a word character, for the last few characters fed
+    def is_word_at(self, index):
+        if index < 0:
+            return False
+        return self.word_flags[index - self.position + len(self.word_flags)]
+
+    # Count the matches ending at the current position, now that it is known whether a boundary follows them
+    def resolve(self, boundary):
+        if boundary:
+            for term in self.pending:
+                self.counts[term] += 1
+                self.last_end[term] = self.position
+        self.pending = []
+
+    # Scan the next piece of text, carrying the automaton state and any unfinished match over from the previous piece
+    def feed(self, text):
+        for char in text:
+            is_word = char.isalnum() or char == '_'
+            boundary = self.is_word_at(self.position - 1) != is_word
+            self.resolve(boundary)
+            if boundary and '' in self.counts:
+                self.counts[''] += 1
+            self.word_flags.append(is_word)
+            self.position += 1
+
+            while self.state and char not in self.goto[self.state]:
+                self.state = self.fail[self.state]
+            self.state = self.goto[self.state].get(char, 0)
+            for term in self.output[self.state]:
+                start = self.position - len(term)
+                if start >= self.last_end[term] and self.is_word_at(start - 1) != self.is_word_at(start):
+                    self.pending.append(term)
+
+    # Finish the text and return the count of every term
+    def close(self):
+        boundary = self.is_word_at(self.position - 1)
+        self.resolve(boundary)
+        if boundary and '' in self.counts:
+            self.counts[''] += 1
+        return self.counts
+
+# Count the whole-word occurrences of every term in the text in a single scan
+def count_terms(text, terms):
+    counter = TermCounter(terms)
+    counter.feed(text)
+    return counter.close()
+
+# Find the regions enclosing an element from the regions each of its ancestors matched
+# The answer for every element on the way up is remembered, so each element is only looked at once per page
+def get_enclosing_regions(element, matched, memo):
+    path = []
+    while element is not None and element_id(element) not in memo:
+        path.append(element)
+        element = element.parent
+    regions = memo[element_id(element)] if element is not None else frozenset()
+    for element in reversed(path):
+        regions = regions | matched.get(element_id(element), frozenset())
+        memo[element_id(element)] = regions
+    return regions
+
+# Count the occurrences of each text string in every region of the page in one walk of the document
+# Each region is a CSS selector such as main, nav, footer or h1,h2; text inside nested matches of a region is counted once
+def count_region_occurrences(url, texts, regions):
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        if tag:
-            elements = soup.find_all(tag)
-            body_text = ' '.join([' '.join(element.stripped_strings).lower() for element in elements])
-        else:
-            body_text = ' '.join(soup.body.stripped_strings).lower() if soup.body else ''
-
-        for text in texts:
-            pattern = r'\b' + re.escape(text.lower()) + r'\b'
-            text_count[text] = len(re.findall(pattern, body_text))
+        response = fetch(url)
+        soup = make_soup(response.text)
     except requests.exceptions.RequestException as e:
         print(f"\nError fetching URL: {e}")
         return None
-    return text_count
+
+    matched = {}
+    for region in regions:
+        for element in soup.select(region):
+            matched.setdefault(element_id(element), set()).add(region)
+    matched = {key: frozenset(value) for key, value in matched.items()}
+
+    terms = [text.lower() for text in texts]
+    automaton = build_automaton([term for term in set(terms) if term])
+    counters = {region: TermCounter(terms, automaton) for region in regions}
+    memo = {}
+    for string, parent in strings_with_parents(soup):
+        string = string.strip()
+        if not string:
+            continue
+        string = string.lower()
+        for region in get_enclosing_regions(parent, matched, memo):
+            counter = counters[region]
+            if counter.position:
+                counter.feed(' ')
+            counter.feed(string)
+
+    region_counts = {}
+    for region, counter in counters.items():
+        term_counts = counter.close()
+        region_counts[region] = {text: term_counts[text.lower()] for text in texts}
+    return region_counts
+
+# Count the occurrences of each text string in the specified tag, or the whole body
+def count_text_occurrences(url, texts, tag=None):
+    region = tag or 'body'
+    region_counts = count_region_occurrences(url, texts, [region])
+    if region_counts is None:
+        return None
+    return region_counts[region]
 
 # Output the results to a file and print them to the console along with datetime program was run
-def output_results(url, counts, output_file, format='txt'):
+# With by_region, counts maps each region to its own text counts
+def output_results(url, counts, output_file, format='txt', by_region=False):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    region_counts = counts if by_region else {None: counts}
     if format == 'csv':
         with open(output_file, "w", newline='', encoding="utf-8") as file:
             csv_writer = csv.writer(file)
-            csv_writer.writerow(['Timestamp', 'URL', 'Text', 'Count'])
-            for text, count in counts.items():
-                csv_writer.writerow([timestamp, url, text, count])
+            csv_writer.writerow(['Timestamp', 'URL'] + (['Region'] if by_region else []) + ['Text', 'Count'])
+            for region, text_counts in region_counts.items():
+                for text, count in text_counts.items():
+                    csv_writer.writerow([timestamp, url] + ([region] if by_region else []) + [text, count])
         print(f"Results saved to {output_file}")
     elif format == 'json':
+        results = []
+        for region, text_counts in region_counts.items():
+            for text, count in text_counts.items():
+                results.append({'region': region, 'text': text, 'count': count} if by_region else {'text': text, 'count': count})
         result_data = {
             'timestamp': timestamp,
             'url': url,
-            'results': [{'text': text, 'count': count} for text, count in counts.items()]
+            'results': results
         }
         with open(output_file, "w", encoding="utf-8") as file:
             json.dump(result_data, file, indent=4)
@@ -84,10 +208,14 @@ def output_results(url, counts, output_file, format='txt'):
         with open(output_file, "w", encoding="utf-8") as file:
             file.write(f"Timestamp: {timestamp}\nURL: {url}\n")
             print(f"\nTimestamp: {timestamp}\nURL: {url}")
-            for text, count in counts.items():
-                line = f"The text '{text}' appears {count} times on the page\n"
-                file.write(line)
-                print(line.strip())
+            for region, text_counts in region_counts.items():
+                for text, count in text_counts.items():
+                    if by_region:
+                        line = f"The text '{text}' appears {count} times in '{region}'\n"
+                    else:
+                        line = f"The text '{text}' appears {count} times on the page\n"
+                    file.write(line)
+                    print(line.strip())
         print(f"\nResults saved to {output_file}")
 
 # Main Function used to gather input and call other functions
@@ -96,6 +224,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Word Counter Script")
     parser.add_argument("url", help="URL to check", nargs='?', default='')
     parser.add_argument("words", help="Comma-separated list of words to search for", nargs='?', default='')
+    parser.add_argument("--region", action='append', default=[], help="CSS selector of a region to count separately, such as main, nav or h1,h2 (repeat for several regions)")
     parser.add_argument("--csv", action='store_true', help="Export results as CSV")
     parser.add_argument("--json", action='store_true', help="Export results as JSON")
     args = parser.parse_args()
@@ -121,17 +250,21 @@ if __name__ == "__main__":
         exit()
     
     word_list = [word.strip() for word in words_input.split(',')]
-    counts = count_text_occurrences(formatted_url, word_list)
+    by_region = bool(args.region)
+    if by_region:
+        counts = count_region_occurrences(formatted_url, word_list, args.region)
+    else:
+        counts = count_text_occurrences(formatted_url, word_list)
     if counts:
-        output_results(formatted_url, counts, "word_counter.txt")
+        output_results(formatted_url, counts, "word_counter.txt", by_region=by_region)
 
         export_csv = args.csv
         export_json = args.json
         if not export_csv:
             export_csv = input("Export results as CSV? (y/n): ").strip().lower() == 'y'
         if export_csv:
-            output_results(formatted_url, counts, "word_counter.csv", format='csv')
+            output_results(formatted_url, counts, "word_counter.csv", format='csv', by_region=by_region)
         if not export_json:
             export_json = input("Export results as JSON? (y/n): ").strip().lower() == 'y'
         if export_json:
-            output_results(formatted_url, counts, "word_counter.json", format='json')
+            output_results(formatted_url, counts, "word_counter.json", format='json', by_region=by_region)
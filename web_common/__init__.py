@@ -0,0 +1,6 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Shared helpers used by the tools in this repository
+For full documentation, see the README in this directory
+"""
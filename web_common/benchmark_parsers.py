@@ -0,0 +1,96 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+This script measures parse + extract throughput of each HTML parser backend on representative pages
+For full documentation, see the README in this directory
+"""
+
+from bs4 import SoupStrainer
+from time import perf_counter
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from web_common.fetch import fetch
+from web_common.parsing import make_soup, PARSERS
+
+LINKS_ONLY = SoupStrainer('a', href=True)
+
+# Build a synthetic page with the given number of sections, each with a heading, paragraphs, links, an image and a list
+def build_page(sections):
+    head = ['<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Benchmark page</title>',
+            '<meta name="description" content="A representative page"><meta name="keywords" content="benchmark, parser">',
+            '<link rel="stylesheet" href="/css/bootstrap.min.css"><script>var analytics = {id: 1};</script><style>body{margin:0}</style></head>',
+            '<body><header><nav><a href="/">Home</a> <a href="/about">About</a> <a href="https://twitter.com/example">Twitter</a></nav></header><main>']
+    body = []
+    for i in range(sections):
+        body.append(f'<section id="section-{i}"><h2>Section {i}</h2>')
+        body.append(f'<p>This is paragraph {i} with <b>bold</b> and <i>italic</i> words, and a <a href="/page-{i}">link to page {i}</a>.</p>')
+        body.append(f'<p>Another paragraph with an <a href="https://example.org/{i}">external link</a> and <a href="#section-{i}">an anchor</a>.</p>')
+        body.append(f'<img src="/images/{i}.png" alt="Image {i}"><ul><li>First item</li><li>Second item</li><li>Third item</li></ul></section>')
+    tail = ['</main><footer><p>Copyright footer text</p></footer></body></html>']
+    return ''.join(head + body + tail)
+
+# Run the queries the tools use on a parsed page
+def extract(soup):
+    links = [link['href'] for link in soup.find_all('a', href=True)]
+    title = soup.title.string if soup.title else ''
+    meta = [tag.attrs for tag in soup.find_all('meta')]
+    text = list(soup.body.stripped_strings) if soup.body else []
+    return links, title, meta, text
+
+# Parse and extract each page repeatedly with the given parser and return pages per second and megabytes per second
+# With parse_only, only the matching elements are built, as the single-element tools do
+def benchmark(parser, pages, repeat, parse_only=None):
+    total_bytes = sum(len(page.encode('utf-8')) for page in pages) * repeat
+    start = perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            extract(make_soup(page, parser, parse_only))
+    elapsed = perf_counter() - start
+    return len(pages) * repeat / elapsed, total_bytes / elapsed / 1_000_000
+
+# Return the peak Python memory in megabytes used to parse and extract a page
+# selectolax allocates its tree outside Python, so it is not measured
+def peak_memory(parser, page, parse_only=None):
+    if parser == 'selectolax':
+        return None
+    tracemalloc.start()
+    extract(make_soup(page, parser, parse_only))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1_000_000
+
+# Main Function used to gather input and call other functions
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTML Parser Benchmark Script")
+    parser.add_argument("sources", nargs='*', help="HTML files or URLs to benchmark (default: synthetic small, medium and large pages)")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of times each page is parsed")
+    args = parser.parse_args()
+
+    if args.sources:
+        pages = {}
+        for source in args.sources:
+            if source.startswith(('http://', 'https://')):
+                pages[source] = fetch(source).text
+            else:
+                with open(source, encoding="utf-8", errors="replace") as file:
+                    pages[source] = file.read()
+    else:
+        pages = {'small (10 sections)': build_page(10), 'medium (200 sections)': build_page(200), 'large (5000 sections)': build_page(5000)}
+
+    configurations = [(backend, None) for backend in PARSERS] + [('html.parser', LINKS_ONLY), ('lxml', LINKS_ONLY)]
+    print(f"\n{'Page':<30}{'Parser':<28}{'Pages/s':>10}{'MB/s':>10}{'Peak MB':>10}")
+    for name, page in pages.items():
+        for backend, parse_only in configurations:
+            label = backend + (' (a[href] only)' if parse_only else '')
+            try:
+                pages_per_second, megabytes_per_second = benchmark(backend, [page], args.repeat, parse_only)
+                peak = peak_memory(backend, page, parse_only)
+            except Exception as e:
+                print(f"{name:<30}{label:<28}  unavailable ({e})")
+                continue
+            peak = f"{peak:.1f}" if peak is not None else "n/a"
+            print(f"{name:<30}{label:<28}{pages_per_second:>10.1f}{megabytes_per_second:>10.2f}{peak:>10}")
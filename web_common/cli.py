@@ -0,0 +1,29 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Shared command-line helpers for validating the options of the tools
+For full documentation, see the README in this directory
+"""
+
+import argparse
+
+# argparse type for options such as --workers and --concurrency that need at least 1
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+# argparse type for options such as --epsilon and --delta that need a fraction strictly between 0 and 1
+def unit_fraction(value):
+    number = float(value)
+    if not 0 < number < 1:
+        raise argparse.ArgumentTypeError(f"must be between 0 and 1 (exclusive), got {value}")
+    return number
+
+# argparse type for options such as --rate that need a number above 0
+def positive_float(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
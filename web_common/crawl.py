@@ -0,0 +1,35 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Shared site crawl for the tools that process every page of a site, built on Page Finder's crawler
+For full documentation, see the README in this directory
+"""
+
+import importlib.util
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_page_finder = None
+
+# Load Page Finder's script as a module (tool directories are not packages), once per run
+def load_page_finder():
+    global _page_finder
+    if _page_finder is None:
+        spec = importlib.util.spec_from_file_location("page_finder", os.path.join(ROOT_DIR, "Page Finder", "page_finder.py"))
+        _page_finder = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_page_finder)
+    return _page_finder
+
+# Crawl the site from the given URL with Page Finder and yield every page found as (url, html)
+# Pages the crawl fetched are handed over with the HTML it downloaded, as soon as they are read, so no page is downloaded twice;
+# pages it found but did not fetch (those max_depth links away) follow at the end with None, for the caller to fetch
+def crawl_pages(url, max_depth=3, max_pages=1000, workers=8, state_file="crawl.db"):
+    page_finder = load_page_finder()
+    store = page_finder.CrawlStore(state_file, page_finder.normalize_url(url))
+    try:
+        yield from page_finder.iter_crawl(url, store, max_depth, max_pages, workers)
+        for page in store.queued():
+            yield page, None
+    finally:
+        store.close()
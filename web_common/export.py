@@ -0,0 +1,20 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Shared export helpers for tools that stream their results to file as each URL is processed
+For full documentation, see the README in this directory
+"""
+
+import csv
+import os
+import shutil
+
+# Write the header row in front of the CSV rows already streamed to output_file
+# Used when the header width depends on results that are only known once every URL has been processed
+def prepend_csv_header(output_file, header):
+    temp_file = output_file + ".tmp"
+    with open(temp_file, "w", newline='', encoding="utf-8") as file:
+        csv.writer(file).writerow(header)
+        with open(output_file, "r", newline='', encoding="utf-8") as rows:
+            shutil.copyfileobj(rows, file)
+    os.replace(temp_file, output_file)
@@ -0,0 +1,114 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Shared HTTP client used by every tool so that repeated requests to the same host reuse connections
+For full documentation, see the README in this directory
+"""
+
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from web_common.http_cache import HTTPCache, build_response, DEFAULT_MAX_BYTES
+from web_common.scheduler import get_scheduler
+import os
+import requests
+import threading
+import time
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
+TIMEOUT = 5
+POOL_CONNECTIONS = 20
+POOL_MAXSIZE = 10
+MAX_RETRIES = 2
+CACHE_FILE = "web_tools_cache.db"
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+_cache_checked = False
+
+# Build a keep-alive session with one connection pool per host
+# pool_connections is the number of hosts to keep pools for, pool_maxsize the number of connections kept per host
+# Accept-Encoding advertises brotli as well as gzip/deflate when a brotli decoder is installed
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(HEADERS)
+    session.headers.update(make_headers(accept_encoding=True))
+    return session
+
+# Replace the shared session, e.g. to raise the pool sizes before a highly concurrent run
+def configure_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = create_session(pool_connections, pool_maxsize)
+    return _session
+
+# Return the shared session, creating it on first use
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+# Send a request through the shared session, applying the common timeout unless one is given
+# Like requests.head, HEAD requests do not follow redirects unless asked to
+# Requests wait for a slot from the shared scheduler, and 429/503 responses are retried up to MAX_RETRIES times
+# once the host's Retry-After has passed; schedule=False skips the scheduler, e.g. for the robots.txt lookups it relies on
+def send(url, method='GET', schedule=True, **kwargs):
+    kwargs.setdefault('timeout', TIMEOUT)
+    if method == 'HEAD':
+        kwargs.setdefault('allow_redirects', False)
+    if not schedule:
+        return get_session().request(method, url, **kwargs)
+
+    scheduler = get_scheduler()
+    for attempt in range(MAX_RETRIES + 1):
+        with scheduler.slot(url) as bucket:
+            response = get_session().request(method, url, **kwargs)
+        bucket.update(response.status_code, response.headers.get('Retry-After'))
+        if response.status_code not in (429, 503) or attempt == MAX_RETRIES:
+            return response
+        response.close()
+
+# Turn on the persistent HTTP cache for the rest of the run
+def enable_cache(path=CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES):
+    global _cache
+    _cache = HTTPCache(path, max_bytes)
+    return _cache
+
+# Return the HTTP cache, turning it on the first time if the WEB_TOOLS_CACHE environment variable names a cache file
+def get_cache():
+    global _cache, _cache_checked
+    if not _cache_checked:
+        _cache_checked = True
+        if _cache is None and os.environ.get('WEB_TOOLS_CACHE'):
+            max_bytes = int(os.environ.get('WEB_TOOLS_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+            enable_cache(os.environ['WEB_TOOLS_CACHE'], max_bytes)
+    return _cache
+
+# Fetch a URL through the shared session (see send), using the HTTP cache for plain GET requests when it is turned on
+# A cached response that is still fresh is returned without a request; otherwise it is revalidated with
+# If-None-Match/If-Modified-Since and returned from the cache when the server answers 304 Not Modified
+def fetch(url, method='GET', schedule=True, **kwargs):
+    cache = get_cache()
+    if cache is None or method != 'GET' or kwargs.get('stream'):
+        return send(url, method, schedule, **kwargs)
+
+    entry = cache.get(url)
+    if entry is not None:
+        if entry['fresh_until'] > time.time():
+            return build_response(url, entry['status'], entry['headers'], entry['body'])
+        kwargs['headers'] = {**cache.conditional_headers(entry), **(kwargs.get('headers') or {})}
+
+    response = send(url, method, schedule, **kwargs)
+    if entry is not None and response.status_code == 304:
+        cache.touch(url, response.headers)
+        return build_response(url, entry['status'], entry['headers'], entry['body'])
+    cache.put(url, response)
+    return response
@@ -0,0 +1,113 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Opt-in persistent HTTP cache used by the shared fetch path, with ETag/Last-Modified revalidation and LRU eviction
+For full documentation, see the README in this directory
+"""
+
+from requests.structures import CaseInsensitiveDict
+import json
+import re
+import requests
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DROPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+
+# Return the number of seconds a response may be reused without revalidation, from its Cache-Control header
+def get_max_age(headers):
+    cache_control = headers.get('Cache-Control', '').lower()
+    if 'no-cache' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else 0
+
+# Rebuild a requests.Response from a cache entry so callers cannot tell it apart from a network response
+def build_response(url, status_code, headers, body):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.reason = 'OK'
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response._content = body
+    response.from_cache = True
+    return response
+
+# Cache of GET responses stored in a single SQLite file
+# Responses are only stored when they carry an ETag or Last-Modified header (so they can be revalidated) and do not say no-store
+# When the total size of the stored bodies goes over max_bytes, the least recently used responses are evicted
+class HTTPCache:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, status INTEGER NOT NULL, headers TEXT NOT NULL, body BLOB NOT NULL, etag TEXT, last_modified TEXT, fresh_until REAL NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    # Return the cached entry for the URL as a dict, or None
+    # Every lookup that finds an entry marks it as used, so fresh hits keep often-read responses from being evicted
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute("SELECT status, headers, body, etag, last_modified, fresh_until FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+        status, headers, body, etag, last_modified, fresh_until = row
+        return {'status': status, 'headers': json.loads(headers), 'body': body, 'etag': etag, 'last_modified': last_modified, 'fresh_until': fresh_until}
+
+    # Return the conditional request headers that revalidate a cached entry
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    # Mark an entry as used and extend its freshness from the headers of the 304 response that confirmed it
+    def touch(self, url, headers):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("UPDATE responses SET last_used = ?, fresh_until = ? WHERE url = ?", (now, now + get_max_age(headers), url))
+            self.conn.commit()
+
+    # Store a response if it can be revalidated later, then evict old entries if the cache is over its size limit
+    def put(self, url, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified) or 'no-store' in response.headers.get('Cache-Control', '').lower():
+            return
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+        headers = {key: value for key, value in response.headers.items() if key.lower() not in DROPPED_HEADERS}
+        now = time.time()
+        with self.lock:
+            old = self.conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (url, response.status_code, json.dumps(headers), body, etag, last_modified, now + get_max_age(response.headers), len(body), now))
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            self.evict()
+            self.conn.commit()
+
+    # Delete least recently used entries until the cache fits in max_bytes (caller holds the lock)
+    def evict(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute("SELECT url, size FROM responses ORDER BY last_used LIMIT 100").fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                self.conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
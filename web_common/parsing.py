@@ -0,0 +1,177 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Shared HTML parsing with a choice of backend: BeautifulSoup with html.parser or lxml, or the much faster selectolax (lexbor)
+For full documentation, see the README in this directory
+"""
+
+from bs4 import BeautifulSoup
+import os
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+PARSERS = ['html.parser', 'lxml', 'selectolax']
+SKIPPED_STRING_PARENTS = {'script', 'style', 'template'}
+
+_default_parser = os.environ.get('WEB_TOOLS_PARSER', 'html.parser')
+
+# Build a CSS selector from BeautifulSoup-style find_all arguments
+# name may be a tag name, a list of tag names or None; attribute filters may be True (attribute present) or an exact string
+def build_selector(name=None, attrs=None, **kwargs):
+    filters = dict(attrs or {})
+    filters.update(kwargs)
+    conditions = ''
+    for key, value in filters.items():
+        key = 'class' if key == 'class_' else key
+        if value is True:
+            conditions += f'[{key}]'
+        elif isinstance(value, str):
+            value = value.replace('\\', '\\\\').replace('"', '\\"')
+            conditions += f'[{key}~="{value}"]' if key == 'class' else f'[{key}="{value}"]'
+        else:
+            raise ValueError(f"Unsupported filter for the selectolax parser: {key}={value!r}")
+    names = [name] if isinstance(name, str) else list(name or ['*'])
+    return ', '.join(tag + conditions for tag in names)
+
+# BeautifulSoup-like view of a selectolax element, covering the queries the tools use:
+# find_all/find (also by calling the node), tag access such as node.title or node.body, attrs/get/[],
+# string, strings/stripped_strings, get_text, descendants, parent and decompose
+class SelectolaxNode:
+    def __init__(self, node):
+        self.node = node
+        self.name = node.tag
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.find(name)
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    def __repr__(self):
+        return self.node.html
+
+    @property
+    def attrs(self):
+        return {key: value if value is not None else '' for key, value in self.node.attributes.items()}
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def has_attr(self, key):
+        return key in self.node.attributes
+
+    @property
+    def parent(self):
+        parent = self.node.parent
+        if parent is None or parent.tag.startswith('-'):
+            return None
+        return SelectolaxNode(parent)
+
+    def select_nodes(self, selector):
+        return [node for node in self.node.css(selector) if node.mem_id != self.node.mem_id]
+
+    def select(self, selector):
+        return [SelectolaxNode(node) for node in self.select_nodes(selector)]
+
+    def find_all(self, name=None, attrs=None, **kwargs):
+        return self.select(build_selector(name, attrs, **kwargs))
+
+    __call__ = find_all
+
+    def find(self, name=None, attrs=None, **kwargs):
+        matches = self.select_nodes(build_selector(name, attrs, **kwargs))
+        return SelectolaxNode(matches[0]) if matches else None
+
+    def traverse(self):
+        return self.node.traverse(include_text=True)
+
+    @property
+    def string(self):
+        children = list(self.node.iter(include_text=True))
+        if len(children) != 1:
+            return None
+        if children[0].tag == '-text':
+            return children[0].text_content
+        return None if children[0].tag.startswith('-') else SelectolaxNode(children[0]).string
+
+    @property
+    def strings(self):
+        for node in self.traverse():
+            if node.tag == '-text' and node.parent.tag not in SKIPPED_STRING_PARENTS:
+                yield node.text_content
+
+    @property
+    def stripped_strings(self):
+        for string in self.strings:
+            string = string.strip()
+            if string:
+                yield string
+
+    def get_text(self, separator='', strip=False):
+        return separator.join(self.stripped_strings if strip else self.strings)
+
+    @property
+    def descendants(self):
+        for node in self.traverse():
+            if node.tag == '-text':
+                yield node.text_content
+            elif not node.tag.startswith('-') and node.mem_id != self.node.mem_id:
+                yield SelectolaxNode(node)
+
+    def decompose(self):
+        self.node.decompose()
+
+# The whole document parsed with selectolax; searches include the <html> element itself, as with BeautifulSoup
+class SelectolaxSoup(SelectolaxNode):
+    def __init__(self, markup):
+        self.parser = LexborHTMLParser(markup)
+        super().__init__(self.parser.root)
+        self.name = '[document]'
+
+    def select_nodes(self, selector):
+        return self.parser.css(selector)
+
+    @property
+    def descendants(self):
+        yield SelectolaxNode(self.node)
+        yield from super().descendants
+
+# Identify an element across queries: BeautifulSoup tags compare equal by content and each selectolax query
+# returns new wrappers, so neither can be kept in a set directly
+def element_id(element):
+    if isinstance(element, SelectolaxNode):
+        return element.node.mem_id
+    return id(element)
+
+# Yield each string of the element, as strings does, paired with the element that directly contains it
+def strings_with_parents(element):
+    if isinstance(element, SelectolaxNode):
+        for node in element.traverse():
+            if node.tag == '-text' and node.parent.tag not in SKIPPED_STRING_PARENTS:
+                yield node.text_content, SelectolaxNode(node.parent)
+    else:
+        for string in element.strings:
+            yield string, string.parent
+
+# Set the parser used when make_soup is not given one
+def set_default_parser(parser):
+    global _default_parser
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser {parser!r}, choose from {', '.join(PARSERS)}")
+    _default_parser = parser
+
+# Parse an HTML document with the given parser, or the default one (WEB_TOOLS_PARSER, html.parser if not set)
+# parse_only is a SoupStrainer naming the only elements to build, for tools that query a single kind of element;
+# selectolax always builds the full tree (in C), so it ignores parse_only
+def make_soup(markup, parser=None, parse_only=None):
+    parser = parser or _default_parser
+    if parser == 'selectolax':
+        if LexborHTMLParser is None:
+            raise ImportError("The selectolax parser needs the selectolax package: pip install selectolax")
+        return SelectolaxSoup(markup)
+    return BeautifulSoup(markup, parser, parse_only=parse_only)
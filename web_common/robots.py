@@ -0,0 +1,94 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Shared robots.txt cache so each host's robots.txt is downloaded once per run rather than once per URL
+For full documentation, see the README in this directory
+"""
+
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+from web_common.fetch import fetch
+import threading
+import time
+
+ROBOTS_TTL = 3600
+ERROR_TTL = 60
+
+_cache = {}
+_in_flight = {}
+_lock = threading.Lock()
+
+# Download and parse the robots.txt file at base_url, following the same rules as RobotFileParser.read
+# A missing robots.txt allows everything, 401/403 disallows everything, and a server or network error returns None
+def load_robots(base_url):
+    rp = RobotFileParser()
+    rp.set_url(f"{base_url}/robots.txt")
+    try:
+        response = fetch(f"{base_url}/robots.txt", schedule=False)
+    except Exception:
+        return None
+    if response.status_code in (401, 403):
+        rp.disallow_all = True
+    elif 400 <= response.status_code < 500:
+        rp.allow_all = True
+    elif response.status_code >= 500:
+        return None
+    else:
+        rp.parse(response.text.splitlines())
+    return rp
+
+# Return the cached robots.txt parser for the URL's scheme and host, downloading it if needed
+# Hosts without a robots.txt are cached as allow-all; hosts that could not be reached are cached as None for ERROR_TTL seconds
+# When several threads ask for the same host at once, only one downloads it and the others wait for its result
+def get_robots(url):
+    parsed_url = urlparse(url)
+    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+    while True:
+        with _lock:
+            entry = _cache.get(base_url)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            event = _in_flight.get(base_url)
+            is_owner = event is None
+            if is_owner:
+                event = _in_flight[base_url] = threading.Event()
+        if not is_owner:
+            event.wait()
+            continue
+
+        # Whatever happens while loading, record the result and wake the waiting threads,
+        # so a robots.txt that fails to parse is cached as unreachable instead of blocking them forever
+        rp = None
+        try:
+            rp = load_robots(base_url)
+        finally:
+            ttl = ROBOTS_TTL if rp is not None else ERROR_TTL
+            with _lock:
+                _cache[base_url] = (time.monotonic() + ttl, rp)
+                del _in_flight[base_url]
+            event.set()
+        return rp
+
+# Check if the website's robots.txt file allows the given URL to be scraped
+def is_allowed(url, user_agent='*'):
+    try:
+        rp = get_robots(url)
+        return rp is not None and rp.can_fetch(user_agent, url)
+    except Exception:
+        return False
+
+# Return the Crawl-delay in seconds that the host's robots.txt sets for user_agent, or None
+def crawl_delay(url, user_agent='*'):
+    try:
+        rp = get_robots(url)
+        return rp.crawl_delay(user_agent) if rp is not None else None
+    except Exception:
+        return None
+
+# Return the Request-rate (requests, seconds) that the host's robots.txt sets for user_agent, or None
+def request_rate(url, user_agent='*'):
+    try:
+        rp = get_robots(url)
+        return rp.request_rate(user_agent) if rp is not None else None
+    except Exception:
+        return None
@@ -0,0 +1,133 @@
+"""
+Author: Russell Elliott
+Date: 2026-10-18
+Shared politeness scheduler that paces requests per host with a token bucket and caps the requests in flight overall
+For full documentation, see the README in this directory
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import threading
+import time
+
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 10
+GLOBAL_CONCURRENCY = 64
+MIN_RATE = 0.1
+MAX_RETRY_AFTER = 60
+
+# Convert a Retry-After header (seconds or an HTTP date) to a number of seconds, capped at MAX_RETRY_AFTER
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+# Token bucket for a single host
+# Tokens refill at rate per second up to burst; each request takes one token and waits while none are left
+# The rate is halved whenever the host answers 429 or 503 and creeps back up to base_rate as requests succeed
+class HostBucket:
+    def __init__(self, rate, burst):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"rate must be greater than 0 and burst at least 1, got {rate} and {burst}")
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    # Wait until a token is available and take it
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                delay = self.blocked_until - now
+                if delay <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+    # Adapt the pace of the host to the status code and Retry-After header of its latest response
+    def update(self, status_code, retry_after=None):
+        with self.lock:
+            if status_code in (429, 503):
+                self.rate = max(MIN_RATE, self.rate / 2)
+                self.tokens = 0
+                delay = parse_retry_after(retry_after)
+                self.blocked_until = time.monotonic() + (delay if delay is not None else 1 / self.rate)
+            elif status_code < 400 and self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * 0.05)
+
+# Hands out request slots, one token bucket per scheme and host plus a global cap on requests in flight
+# A host's rate is lowered to match its robots.txt Crawl-delay or Request-rate when it sets one
+class Scheduler:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_concurrency=GLOBAL_CONCURRENCY):
+        if rate <= 0 or burst < 1 or max_concurrency < 1:
+            raise ValueError(f"rate must be greater than 0, and burst and max_concurrency at least 1, got {rate}, {burst} and {max_concurrency}")
+        self.rate = rate
+        self.burst = burst
+        self.global_limit = threading.BoundedSemaphore(max_concurrency)
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    # Return the bucket for the URL's host, creating it on first use
+    def bucket(self, url):
+        parsed_url = urlparse(url)
+        host = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        with self.lock:
+            bucket = self.buckets.get(host)
+        if bucket is not None:
+            return bucket
+
+        from web_common.robots import crawl_delay, request_rate
+        rate, burst = self.rate, self.burst
+        delay = crawl_delay(url)
+        if delay:
+            rate, burst = min(rate, 1 / float(delay)), 1
+        limit = request_rate(url)
+        if limit and limit.seconds:
+            rate = min(rate, limit.requests / limit.seconds)
+
+        with self.lock:
+            return self.buckets.setdefault(host, HostBucket(rate, burst))
+
+    # Wait for the URL's host to allow another request and for a free global slot, then hold the slot while the request runs
+    @contextmanager
+    def slot(self, url):
+        bucket = self.bucket(url)
+        bucket.acquire()
+        with self.global_limit:
+            yield bucket
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+# Replace the shared scheduler, e.g. to allow a higher per-host rate for a site you control
+def configure_scheduler(rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_concurrency=GLOBAL_CONCURRENCY):
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = Scheduler(rate, burst, max_concurrency)
+    return _scheduler
+
+# Return the shared scheduler, creating it on first use
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler()
+    return _scheduler